@@ -0,0 +1,165 @@
+"""Локальная заглушка вб для бенчмарков: меню каталога и постраничная выдача.
+
+Отвечает как catalog.wb.ru: фильтр priceU, страницы по 100 товаров, не больше 50 страниц.
+Задержка, доля ошибок 5xx и ответов 429 настраиваются.
+"""
+import asyncio
+import random
+from bisect import bisect_left, bisect_right
+
+from aiohttp import web
+
+from benchmarks.memory import BRANDS, SUPPLIERS
+
+CATEGORY_URL = '/catalog/benchmark/tovary'
+SHARD = 'benchmark'
+PAGE_SIZE = 100
+MAX_PAGES = 50
+
+
+def make_details(rnd: random.Random) -> dict:
+    """поля, которые вб отдает в карточке, но парсер не выгружает: размеры, остатки, цвета"""
+    return {
+        'sizes': [{
+            'name': str(size),
+            'origName': str(size),
+            'rank': size,
+            'optionId': rnd.randint(1, 10 ** 9),
+            'stocks': [{'wh': rnd.randint(1, 1000), 'qty': rnd.randint(0, 100)} for _ in range(4)]
+        } for size in range(rnd.randint(1, 8))],
+        'colors': [{'name': 'черный', 'id': 0}],
+        'subjectId': rnd.randint(1, 10000),
+        'subjectParentId': rnd.randint(1, 1000),
+        'pics': rnd.randint(1, 15),
+        'diffPrice': False,
+        'panelPromoId': rnd.randint(1, 1000),
+        'time1': rnd.randint(1, 10),
+        'time2': rnd.randint(10, 100),
+        'wh': rnd.randint(1, 1000),
+        'dtype': 4,
+        'logs': '',
+    }
+
+
+def make_products(count: int, max_price: int = 100000, seed: int = 1, details: bool = False) -> list:
+    """синтетические товары, отсортированные по цене для быстрого отбора по priceU;
+    details - полный размер карточки, как в настоящей выдаче"""
+    rnd = random.Random(seed)
+    products = []
+    for product_id in range(count):
+        price = rnd.randint(100, max_price) * 100
+        products.append({
+            'id': 10000000 + product_id,
+            'name': f'Товар номер {product_id} с длинным названием',
+            'priceU': price,
+            'salePriceU': price * rnd.randint(50, 100) // 100,
+            'sale': rnd.randint(0, 90),
+            'brand': rnd.choice(BRANDS),
+            'rating': rnd.choice([0, 4, 5]),
+            'supplier': rnd.choice(SUPPLIERS),
+            'supplierRating': round(rnd.uniform(3, 5), 1),
+            'feedbacks': rnd.randint(0, 5000),
+            'reviewRating': round(rnd.uniform(3, 5), 1),
+            'promoTextCard': rnd.choice([None, 'ХИТ']),
+            'promoTextCat': rnd.choice([None, 'ХИТ'])
+        })
+        if details:
+            products[-1].update(make_details(rnd))
+    products.sort(key=lambda product: product['priceU'])
+    return products
+
+
+def make_menu() -> list:
+    """меню в формате main-menu-ru-ru-v2.json с одной категорией для бенчмарка"""
+    return [{
+        'id': 1,
+        'name': 'Бенчмарк',
+        'url': '/catalog/benchmark',
+        'childs': [{
+            'id': 2,
+            'name': 'Товары',
+            'url': CATEGORY_URL,
+            'shard': SHARD,
+            'query': 'subject=1'
+        }]
+    }]
+
+
+class FakeWB:
+    """aiohttp сервер на 127.0.0.1 со случайным портом"""
+
+    def __init__(self, products: int = 5000, latency: float = 0.01, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, with_total: bool = False, details: bool = False, seed: int = 1):
+        self.products = make_products(products, seed=seed, details=details)
+        self.prices = [product['priceU'] for product in self.products]
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.with_total = with_total
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.runner = None
+        self.base_url = None
+
+    @property
+    def menu_url(self) -> str:
+        return f'{self.base_url}/menu/main-menu-ru-ru-v2.json'
+
+    @property
+    def catalog_api(self) -> str:
+        return f'{self.base_url}/catalog'
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/menu/main-menu-ru-ru-v2.json', self.menu)
+        app.router.add_get('/catalog/{shard}/catalog', self.catalog)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.base_url = f'http://127.0.0.1:{port}'
+        return self
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def menu(self, request: web.Request) -> web.Response:
+        return web.json_response(make_menu())
+
+    async def catalog(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        chance = self.random.random()
+        if chance < self.throttle_rate:
+            self.throttled += 1
+            return web.Response(status=429)
+        if chance < self.throttle_rate + self.error_rate:
+            self.errors += 1
+            return web.Response(status=503)
+        page = int(request.query.get('page', 1))
+        low, top = map(int, request.query['priceU'].split(';'))
+        start = bisect_left(self.prices, low)
+        end = bisect_right(self.prices, top)
+        data = {'products': []}
+        if page <= MAX_PAGES:
+            offset = start + (page - 1) * PAGE_SIZE
+            data['products'] = self.products[offset:min(offset + PAGE_SIZE, end)]
+        if self.with_total:
+            data['total'] = end - start
+        return web.json_response({'data': data})
+
+    def summary(self) -> dict:
+        return {'requests': self.requests, 'errors': self.errors, 'throttled': self.throttled}
+
@@ -0,0 +1,94 @@
+"""Сравнение памяти: список словарей (старый get_data_from_json) и ProductColumns.
+
+Запуск из корня проекта: python -m benchmarks.memory [кол-во товаров ...]
+"""
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from products import ProductColumns, iter_products, product_link
+
+SIZES = [5000, 50000, 500000]
+BRANDS = [f'Бренд {i}' for i in range(300)]
+SUPPLIERS = [f'ООО Продавец {i}' for i in range(1000)]
+
+
+def make_page(start: int, size: int = 100) -> dict:
+    """синтетическая страница выдачи вб"""
+    products = []
+    for product_id in range(start, start + size):
+        price = random.randint(100, 100000) * 100
+        products.append({
+            'id': 10000000 + product_id,
+            'name': f'Товар номер {product_id} с длинным названием',
+            'priceU': price,
+            'salePriceU': price * random.randint(50, 100) // 100,
+            'sale': random.randint(0, 90),
+            'brand': random.choice(BRANDS),
+            'rating': random.choice([0, 4, 5]),
+            'supplier': random.choice(SUPPLIERS),
+            'supplierRating': round(random.uniform(3, 5), 1),
+            'feedbacks': random.randint(0, 5000),
+            'reviewRating': round(random.uniform(3, 5), 1),
+            'promoTextCard': random.choice([None, 'ХИТ']),
+            'promoTextCat': random.choice([None, 'ХИТ'])
+        })
+    return {'data': {'products': products}}
+
+
+def as_dicts(pages: list) -> list:
+    """старое представление: словарь с 14 ключами и готовой ссылкой на каждый товар"""
+    data_list = []
+    for page in pages:
+        for row in iter_products(page):
+            data_list.append(dict(zip(
+                ['id', 'Наименование', 'Цена', 'Цена со скидкой', 'Скидка', 'Бренд', 'Рейтинг', 'Продавец',
+                 'Рейтинг продавца', 'Кол-во отзывов', 'Рейтинг отзывов', 'Промо текст карточки',
+                 'Промо текст категории'],
+                row
+            ), **{'Ссылка': product_link(row[0])}))
+    return data_list
+
+
+def as_columns(pages: list) -> ProductColumns:
+    columns = ProductColumns()
+    for page in pages:
+        for row in iter_products(page):
+            columns.write(row)
+    return columns
+
+
+def measure(build, to_dataframe, pages: list) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    storage = build(pages)
+    stored = tracemalloc.get_traced_memory()[0]
+    df = to_dataframe(storage)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del df, storage
+    return {'stored_mb': stored / 2 ** 20, 'peak_mb': peak / 2 ** 20, 'seconds': elapsed}
+
+
+def main(sizes: list):
+    import pandas as pd
+
+    random.seed(1)
+    print(f'{"товаров":>8} | {"хранение":<10} | {"в памяти, МБ":>12} | {"пик с DataFrame, МБ":>19} | {"время, с":>8}')
+    for size in sizes:
+        pages = [make_page(start, min(100, size - start)) for start in range(0, size, 100)]
+        for name, build, to_dataframe in (
+            ('dict', as_dicts, pd.DataFrame),
+            ('columns', as_columns, ProductColumns.to_dataframe)
+        ):
+            result = measure(build, to_dataframe, pages)
+            print(f'{size:>8} | {name:<10} | {result["stored_mb"]:>12.1f} | {result["peak_mb"]:>19.1f} | '
+                  f'{result["seconds"]:>8.2f}')
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or SIZES)
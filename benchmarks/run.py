@@ -0,0 +1,250 @@
+"""Сквозной бенчмарк parser() на локальной заглушке вб (benchmarks/fake_wb.py).
+
+Запуск из корня проекта:
+    python -m benchmarks.run                          все сценарии, результат в benchmark_results.json
+    python -m benchmarks.run small flaky -o new.json  выбранные сценарии
+    python -m benchmarks.run --compare old.json       сравнить с результатом прошлой версии
+
+Каждый сценарий выполняется в отдельном процессе, чтобы пиковая память (RSS) не смешивалась.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import parser as wb_parser
+from benchmarks.fake_wb import CATEGORY_URL, FakeWB
+from catalog import CatalogCache
+from decoding import DECODER
+from exporters import DEFAULT_FORMATS
+from parser import CrawlContext, create_session, parser
+from throttle import RateLimiter
+
+RESULTS_PATH = 'benchmark_results.json'
+# по умолчанию ограничитель почти не сдерживает запросы: измеряется сам парсер, а не вежливость к вб
+BENCHMARK_RATE = 1000
+SCENARIOS = {
+    'small': {'products': 3000},
+    'capped': {'products': 20000},  # больше 50 страниц - деление диапазона цен
+    'total': {'products': 20000, 'with_total': True},  # вб отдает data.total
+    'flaky': {'products': 5000, 'error_rate': 0.03, 'throttle_rate': 0.02},
+    'slow': {'products': 5000, 'latency': 0.1},
+    'heavy': {'products': 20000, 'with_total': True, 'details': True},  # карточки полного размера
+}
+# метрики для сравнения версий; True - больше значит лучше
+COMPARED = {'pages_per_sec': True, 'products_per_sec': True, 'latency_p50_ms': False, 'latency_p99_ms': False,
+            'export_seconds': False, 'peak_rss_mb': False, 'export_peak_rss_mb': False}
+EXPORT_LINE = re.compile(r'\((\w+): ([\d.]+) c\)$')
+
+
+def percentile(values: list, share: float) -> float:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def peak_rss_mb(children: bool = False) -> float:
+    """пиковая память процесса; children - самого большого из завершенных дочерних процессов (пул выгрузки).
+    None, если ее не получить"""
+    try:
+        import resource
+    except ImportError:
+        if children:
+            return None
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2 ** 20
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # linux отдает килобайты, macos - байты
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+class PageLatency:
+    """время ответа на запросы страниц со стороны клиента"""
+
+    def __init__(self):
+        self.seconds = []
+
+    def trace_config(self):
+        import aiohttp
+
+        async def on_start(session, ctx, params):
+            ctx.request_start = time.perf_counter()
+
+        async def on_end(session, ctx, params):
+            if params.url.path.endswith('/catalog'):
+                self.seconds.append(time.perf_counter() - ctx.request_start)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_start)
+        trace_config.on_request_end.append(on_end)
+        return trace_config
+
+
+class BenchmarkLog:
+    """лог парсера: собираем счетчики прогресса, время выгрузки и метрики этапов"""
+
+    def __init__(self):
+        self.lines = []
+        self.counters = {}
+        self.export_seconds = 0.0
+        self.stages = {}
+
+    def append(self, text: str):
+        self.lines.append(text)
+        match = EXPORT_LINE.search(text)
+        if text.startswith('Все сохранено') and match:
+            self.export_seconds += float(match.group(2))
+
+    def progress(self, **counters):
+        for key, value in counters.items():
+            if key != 'planned':
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def metrics(self, metrics: dict):
+        self.stages = metrics['stages']
+
+
+async def run_scenario(params: dict, formats: str, rate: float) -> dict:
+    log = BenchmarkLog()
+    latency = PageLatency()
+    with tempfile.TemporaryDirectory() as folder:
+        async with FakeWB(**params) as server:
+            wb_parser.CATALOG_API = server.catalog_api
+            context = CrawlContext(
+                limiter=RateLimiter(rate=rate, burst=max(1, int(rate))),
+                catalog=CatalogCache(path=os.path.join(folder, 'catalog.json'), url=server.menu_url),
+                store_path=None,
+                # контрольные точки и отпечатки - во временной папке: прерванный сценарий не ускоряет следующий
+                checkpoints_dir=os.path.join(folder, 'checkpoints'),
+                fingerprints_dir=os.path.join(folder, 'fingerprints')
+            )
+            context.session = create_session(context.connection_stats, context.limiter.max_concurrency,
+                                             trace_configs=[latency.trace_config()])
+            start = time.perf_counter()
+            try:
+                ok = await parser(log, CATEGORY_URL, save_path=folder, context=context, export_formats=formats)
+            finally:
+                await context.close()
+            seconds = time.perf_counter() - start
+            server_stats = server.summary()
+    pages = log.counters.get('pages', 0)
+    peak_rss = peak_rss_mb()
+    # context.close() дождался процессов пула выгрузки, их память уже учтена в RUSAGE_CHILDREN
+    export_rss = peak_rss_mb(children=True)
+    products = log.counters.get('products', 0)
+    return {
+        'ok': ok,
+        'params': params,
+        'seconds': round(seconds, 3),
+        'pages': pages,
+        'products': products,
+        'pages_per_sec': round(pages / seconds, 1),
+        'products_per_sec': round(products / seconds, 1),
+        'latency_p50_ms': round(percentile(latency.seconds, 0.5) * 1000, 2) if latency.seconds else None,
+        'latency_p99_ms': round(percentile(latency.seconds, 0.99) * 1000, 2) if latency.seconds else None,
+        'requests': context.limiter.requests,
+        'retries': context.limiter.retries,
+        'export_seconds': round(log.export_seconds, 3),
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+        'export_peak_rss_mb': round(export_rss, 1) if export_rss is not None else None,
+        'stages': log.stages,
+        'server': server_stats,
+        'errors': [line for line in log.lines if line.startswith(('[-]', 'Ошибка'))][:10],
+    }
+
+
+def run_in_subprocess(name: str, args) -> dict:
+    command = [sys.executable, '-m', 'benchmarks.run', '--child', name, '--formats', args.formats, '--rate', str(args.rate)]
+    project = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.run(command, cwd=project, capture_output=True, text=True, encoding='utf-8')
+    if process.returncode != 0 or not process.stdout.strip():
+        return {'ok': False, 'error': process.stderr.strip().splitlines()[-1:] or ['нет вывода']}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(base: dict, current: dict):
+    """изменение метрик относительно прошлого результата; ухудшение помечается '!'"""
+    print(f'\nСравнение с {base.get("revision")} ({base.get("time")}):')
+    for name, result in current['scenarios'].items():
+        old = base.get('scenarios', {}).get(name)
+        if not old or not result.get('ok') or not old.get('ok'):
+            continue
+        changes = []
+        for key, higher_is_better in COMPARED.items():
+            if not old.get(key) or result.get(key) is None:
+                continue
+            change = (result[key] - old[key]) / old[key] * 100
+            worse = change < 0 if higher_is_better else change > 0
+            changes.append(f'{key} {change:+.1f}%{" !" if worse and abs(change) >= 5 else ""}')
+        print(f'{name:>8}: {", ".join(changes)}')
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Бенчмарк парсера на локальной заглушке вб')
+    arg_parser.add_argument('scenarios', nargs='*', help=f'сценарии: {", ".join(SCENARIOS)} (по умолчанию все)')
+    arg_parser.add_argument('-o', '--output', default=RESULTS_PATH, help='файл результатов json')
+    arg_parser.add_argument('--formats', default=DEFAULT_FORMATS, help='форматы выгрузки через запятую')
+    arg_parser.add_argument('--rate', type=float, default=BENCHMARK_RATE, help='ограничение запросов в секунду')
+    arg_parser.add_argument('--compare', default=None, help='прошлый файл результатов для сравнения')
+    arg_parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args(argv)
+    unknown = set(args.scenarios) - SCENARIOS.keys()
+    if unknown:
+        arg_parser.error(f'неизвестные сценарии: {", ".join(sorted(unknown))}')
+
+    if args.child:
+        result = asyncio.run(run_scenario(SCENARIOS[args.child], args.formats, args.rate))
+        print(json.dumps(result, ensure_ascii=False))
+        return 0
+
+    results = {
+        'revision': git_revision(),
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'decoder': DECODER,
+        'formats': args.formats,
+        'rate': args.rate,
+        'rss_note': 'peak_rss_mb - только процесс парсера: таблицы собираются и пишутся в пуле процессов, '
+                    'их память - export_peak_rss_mb (пик самого большого процесса пула)',
+        'scenarios': {}
+    }
+    print(f'{"сценарий":>8} | {"стр/с":>7} | {"товаров/с":>9} | {"p50, мс":>7} | {"p99, мс":>7} | '
+          f'{"выгрузка, с":>11} | {"RSS, МБ":>7} | {"RSS пула, МБ":>12}')
+    for name in args.scenarios or SCENARIOS:
+        result = results['scenarios'][name] = run_in_subprocess(name, args)
+        if not result.get('ok'):
+            print(f'{name:>8} | ошибка: {result.get("error") or result.get("errors")}')
+            continue
+        print(f'{name:>8} | {result["pages_per_sec"]:>7} | {result["products_per_sec"]:>9} | '
+              f'{result["latency_p50_ms"]:>7} | {result["latency_p99_ms"]:>7} | {result["export_seconds"]:>11} | '
+              f'{result["peak_rss_mb"]:>7} | {str(result.get("export_peak_rss_mb")):>12}')
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=4)
+    print(f'Результаты сохранены в {args.output}')
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            compare(json.load(file), results)
+    return 0 if all(result.get('ok') for result in results['scenarios'].values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import os
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/113.0",
+    "Accept": "*/*",
+    "Accept-Language": "ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3",
+    "Origin": "https://www.wildberries.ru",
+    "Sec-Fetch-Dest": "empty",
+    "Sec-Fetch-Mode": "cors",
+    "Sec-Fetch-Site": "cross-site"
+}
+CATALOG_URL = 'https://static-basket-01.wbbasket.ru/vol0/data/main-menu-ru-ru-v2.json'
+CATALOG_CACHE_PATH = 'catalog_cache.json'
+CATALOG_TTL = 24 * 60 * 60  # через сколько секунд каталог проверяется на сервере заново
+
+
+def normalize_path(url: str) -> str:
+    """путь раздела без домена, параметров и завершающего слеша: ключ индекса каталога"""
+    path = urlsplit(url.strip()).path
+    return path.rstrip('/').lower()
+
+
+def get_data_category(catalogs_wb) -> list:
+    """сбор данных категорий из каталога Wildberries"""
+    catalog_data = []
+    stack = [catalogs_wb]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif 'childs' in node:
+            stack.append(node['childs'])
+        elif 'url' in node:
+            catalog_data.append({
+                'name': f"{node['name']}",
+                'shard': node.get('shard', None),
+                'url': node['url'],
+                'query': node.get('query', None)
+            })
+    return catalog_data
+
+
+class CatalogCache:
+    """каталог вб: кэш на диске с TTL, перепроверка по ETag/Last-Modified и индекс разделов по пути"""
+
+    def __init__(self, path: str = CATALOG_CACHE_PATH, ttl: int = CATALOG_TTL, url: str = CATALOG_URL):
+        self.path = path
+        self.ttl = ttl
+        self.url = url
+        self.etag = None
+        self.last_modified = None
+        self.fetched_at = 0
+        self.categories = []
+        self.index = {}
+        self._lock = None
+
+    def is_fresh(self) -> bool:
+        return bool(self.index) and time.time() - self.fetched_at < self.ttl
+
+    def _read_disk(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                cache = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return
+        self.etag = cache.get('etag')
+        self.last_modified = cache.get('last_modified')
+        self.fetched_at = cache.get('fetched_at', 0)
+        self._set_categories(cache.get('categories', []))
+
+    def _write_disk(self):
+        cache = {
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'fetched_at': self.fetched_at,
+            'categories': self.categories
+        }
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(cache, file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _set_categories(self, categories: list):
+        self.categories = categories
+        self.index = {normalize_path(category['url']): category for category in categories}
+
+    async def _revalidate(self, session: aiohttp.ClientSession):
+        headers = dict(HEADERS)
+        if self.index and self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.index and self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        async with session.get(self.url, headers=headers) as r:
+            if r.status == 304:
+                self.fetched_at = time.time()
+                self._write_disk()
+                return
+            r.raise_for_status()
+            menu = await r.json(content_type=None)
+            self.etag = r.headers.get('ETag')
+            self.last_modified = r.headers.get('Last-Modified')
+        self.fetched_at = time.time()
+        self._set_categories(get_data_category(menu))
+        self._write_disk()
+
+    async def load(self, session: aiohttp.ClientSession):
+        """каталог из памяти, с диска или с сервера, если кэш устарел"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.is_fresh():
+                return
+            if not self.index:
+                self._read_disk()
+                if self.is_fresh():
+                    return
+            try:
+                await self._revalidate(session)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                # сервер недоступен: работаем с устаревшим кэшем, если он есть
+                if not self.index:
+                    raise
+
+    def find(self, url: str) -> dict:
+        """проверка пользовательской ссылки на наличии в каталоге"""
+        return self.index.get(normalize_path(url))
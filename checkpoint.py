@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import time
+
+from products import PRODUCT_KEYS
+
+CHECKPOINTS_DIR = 'checkpoints'
+CHECKPOINT_INTERVAL = 2  # как часто сохранять файл контрольной точки, сек.
+CHECKPOINT_TTL = 6 * 60 * 60  # более старые контрольные точки не используются, сек.
+# поля товара, которые нужны для выгрузки; остальное в файл не сохраняется
+SPILL_KEYS = PRODUCT_KEYS
+
+
+def unit_key(low_price: int, top_price: int, page: int = None) -> str:
+    return f'{low_price}:{top_price}' if page is None else f'{low_price}:{top_price}:{page}'
+
+
+class Checkpoint:
+    """контрольная точка запуска: какие страницы (поддиапазон, страница) собраны и где лежат их товары.
+    Товары страниц дописываются в файл .jsonl, смещения строк хранятся в небольшом .json"""
+
+    def __init__(self, task_key: str, folder: str = CHECKPOINTS_DIR):
+        name = hashlib.sha1(task_key.encode()).hexdigest()
+        self.task_key = task_key
+        self.path = os.path.join(folder, f'{name}.json')
+        self.spill_path = os.path.join(folder, f'{name}.jsonl')
+        self.units = {}  # ключ страницы -> [смещение, длина] строки в файле товаров
+        self.splits = set()  # поделенные диапазоны цен
+        self.started = time.time()
+        self.saved = 0.0
+        self.spill = None
+
+    def load(self):
+        """загружаем прерванный запуск той же задачи, если он не устарел"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return self
+        if state.get('task') != self.task_key or time.time() - state.get('started', 0) > CHECKPOINT_TTL:
+            self.remove()
+            return self
+        spill_size = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+        # строки, дописанные после последнего сохранения или оборванные, не учитываются
+        self.units = {key: unit for key, unit in state.get('units', {}).items() if unit[0] + unit[1] <= spill_size}
+        self.splits = set(state.get('splits', []))
+        self.started = state['started']
+        return self
+
+    def __len__(self):
+        return len(self.units)
+
+    def get(self, low_price: int, top_price: int, page: int) -> dict:
+        """сохраненная страница в виде ответа вб или None, если ее нужно запросить"""
+        unit = self.units.get(unit_key(low_price, top_price, page))
+        if unit is None:
+            return None
+        with open(self.spill_path, 'rb') as file:
+            file.seek(unit[0])
+            return json.loads(file.read(unit[1]))
+
+    def record(self, low_price: int, top_price: int, page: int, json_file: dict):
+        """дописываем товары собранной страницы"""
+        data = json_file.get('data') or {}
+        page_data = {'data': {'products': [{key: product.get(key) for key in SPILL_KEYS}
+                                           for product in data.get('products') or []]}}
+        if data.get('total') is not None:
+            page_data['data']['total'] = data['total']
+        line = json.dumps(page_data, ensure_ascii=False).encode() + b'\n'
+        if self.spill is None:
+            os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+            self.spill = open(self.spill_path, 'ab')
+        offset = self.spill.seek(0, os.SEEK_END)
+        self.spill.write(line)
+        self.units[unit_key(low_price, top_price, page)] = [offset, len(line)]
+        self.save(force=False)
+
+    def is_split(self, low_price: int, top_price: int) -> bool:
+        return unit_key(low_price, top_price) in self.splits
+
+    def record_split(self, low_price: int, top_price: int):
+        self.splits.add(unit_key(low_price, top_price))
+        self.save(force=False)
+
+    def save(self, force: bool = True):
+        if not force and time.time() - self.saved < CHECKPOINT_INTERVAL:
+            return
+        if self.spill is not None:
+            self.spill.flush()
+        state = {'task': self.task_key, 'started': self.started, 'units': self.units, 'splits': sorted(self.splits)}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self.path)
+        self.saved = time.time()
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+
+    def remove(self):
+        """запуск завершен: контрольная точка больше не нужна"""
+        self.close()
+        for path in (self.path, self.spill_path):
+            if os.path.exists(path):
+                os.remove(path)
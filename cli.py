@@ -0,0 +1,186 @@
+"""Запуск задач из tasks.json без интерфейса (сервер, cron).
+
+    python cli.py list
+    python cli.py run 1 3 --formats csv --concurrency 2
+    python cli.py run --all
+    python cli.py daemon
+
+Вывод - по одному json на строку. pandas загружается только для выгрузки в xlsx/parquet/feather.
+"""
+import time
+
+START = time.perf_counter()  # отсчет холодного старта до импорта тяжелых модулей
+
+import argparse
+import asyncio
+import datetime
+import json
+import sys
+
+from exporters import DEFAULT_FORMATS
+from manager import CRUDManager
+from parser import CrawlContext, parser
+from periodic import DATE_FORMAT, PeriodicScheduler
+
+SCHEDULE_INTERVAL = 30  # как часто демон проверяет расписание, сек.
+
+
+def emit(event: str, **fields):
+    """одна строка структурированного лога"""
+    record = {'time': datetime.datetime.now().isoformat(timespec='seconds'), 'event': event}
+    record.update(fields)
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+
+
+class JsonLog:
+    """лог задачи в виде json строк; прогресс по страницам выводится только с --verbose"""
+
+    def __init__(self, task: dict, verbose: bool = False):
+        self.task = task
+        self.verbose = verbose
+
+    def append(self, text: str):
+        if self.verbose or not text.startswith(('[+]', 'Страниц в выдаче')):
+            emit('log', task=self.task['id'], message=text)
+
+    def progress(self, **counters):
+        if self.verbose:
+            emit('progress', task=self.task['id'], **counters)
+
+    def metrics(self, metrics: dict):
+        emit('metrics', task=self.task['id'], metrics=metrics)
+
+
+async def run_task(task: dict, context: CrawlContext, args, semaphore: asyncio.Semaphore) -> bool:
+    async with semaphore:
+        emit('start', task=task['id'], name=task['name'])
+        start = time.perf_counter()
+        log = JsonLog(task, args.verbose)
+        try:
+            ok = await parser(
+                log,
+                url=task['link'],
+                low_price=int(task['low_price']),
+                top_price=int(task['top_price']),
+                discount=int(task['discount']),
+                save_path=args.folder,
+                context=context,
+                export_formats=args.formats or task.get('export_formats', DEFAULT_FORMATS),
+                delta=args.delta or task.get('delta', False),
+                dests=args.dests or task.get('dests', ''),
+                sort_by_discount=args.sort_discount or task.get('sort_by_discount', False)
+            )
+        except Exception as e:
+            emit('error', task=task['id'], message=repr(e))
+            ok = False
+        duration = round(time.perf_counter() - start, 1)
+        emit('finish', task=task['id'], ok=ok, seconds=duration)
+        if ok:
+            task['last_update'] = datetime.datetime.now().strftime(DATE_FORMAT)
+            task['last_duration'] = duration
+        return ok
+
+
+def save_task_updates(args, tasks: list):
+    """дописываем в файл время успешных запусков, не затирая задачи, измененные за время работы"""
+    crud_tasks = CRUDManager(args.tasks, [])
+    updated = {task['id']: task for task in tasks}
+    current = crud_tasks.read()
+    for task in current:
+        if task['id'] in updated:
+            for key in ('last_update', 'last_duration'):
+                if key in updated[task['id']]:
+                    task[key] = updated[task['id']][key]
+    crud_tasks.update(current)
+
+
+def crawl_context(args) -> CrawlContext:
+    return CrawlContext(cache_ttl=args.cache_ttl * 60, metrics_dir=args.metrics, profile=args.profile,
+                        export_workers=args.export_workers)
+
+
+async def run(args, tasks: list) -> bool:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    async with crawl_context(args) as context:
+        results = await asyncio.gather(*[run_task(task, context, args, semaphore) for task in tasks])
+    save_task_updates(args, tasks)
+    return all(results)
+
+
+async def daemon(args):
+    """постоянная работа: задачи запускаются по своему расписанию"""
+    scheduler = PeriodicScheduler()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    running = {}
+    async with crawl_context(args) as context:
+        while True:
+            tasks = CRUDManager(args.tasks, []).read()
+            for task in scheduler.due(tasks, lambda task_id: task_id in running):
+                async def run_scheduled(task=task):
+                    try:
+                        if await run_task(task, context, args, semaphore):
+                            save_task_updates(args, [task])
+                    finally:
+                        running.pop(task['id'], None)
+                running[task['id']] = asyncio.create_task(run_scheduled())
+            await asyncio.sleep(SCHEDULE_INTERVAL)
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Парсер Wildberries без интерфейса')
+    arg_parser.add_argument('--tasks', default='tasks.json', help='файл задач')
+    arg_parser.add_argument('--folder', default=None, help='папка для выгрузки (по умолчанию из config.json)')
+    arg_parser.add_argument('--formats', default=None, help='форматы выгрузки через запятую: xlsx, csv, parquet, feather')
+    arg_parser.add_argument('--concurrency', type=int, default=4, help='сколько задач выполнять одновременно')
+    arg_parser.add_argument('--dests', default=None,
+                            help='регионы (dest) через запятую; для нескольких - сводная таблица цен по регионам')
+    arg_parser.add_argument('--delta', action='store_true', help='выгружать только изменения с прошлого запуска')
+    arg_parser.add_argument('--sort-discount', action='store_true',
+                            help='сортировать выгрузку по глубине скидки (по умолчанию - порядок выдачи вб)')
+    arg_parser.add_argument('--cache-ttl', type=float, default=None,
+                            help='срок жизни кэша ответов вб, мин; 0 - выкл. (по умолчанию из config.json)')
+    arg_parser.add_argument('--metrics', default=None, metavar='FOLDER',
+                            help='сохранять метрики каждого запуска (json) в папку')
+    arg_parser.add_argument('--profile', action='store_true',
+                            help='профилировать запуски cProfile (.prof рядом с метриками)')
+    arg_parser.add_argument('--export-workers', type=int, default=None,
+                            help='процессов для выгрузки таблиц (по умолчанию по числу ядер, 0 - в пуле потоков)')
+    arg_parser.add_argument('--verbose', action='store_true', help='выводить каждую страницу и прогресс')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='список задач')
+    run_parser = commands.add_parser('run', help='запуск задач')
+    run_parser.add_argument('ids', nargs='*', type=int, help='id задач')
+    run_parser.add_argument('--all', action='store_true', help='запустить все задачи')
+    commands.add_parser('daemon', help='запуск задач по расписанию')
+    args = arg_parser.parse_args(argv)
+
+    config = CRUDManager('config.json', {'default_folder': ""}).read()
+    if args.folder is None:
+        args.folder = config.get('default_folder', '')
+    if args.cache_ttl is None:
+        args.cache_ttl = config.get('cache_ttl', 0)
+    emit('startup', seconds=round(time.perf_counter() - START, 3),
+         pandas_loaded='pandas' in sys.modules, qt_loaded='PyQt5' in sys.modules)
+
+    tasks = CRUDManager(args.tasks, []).read()
+    if args.command == 'list':
+        for task in tasks:
+            emit('task', **task)
+        return 0
+    if args.command == 'daemon':
+        try:
+            asyncio.run(daemon(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    if not args.all:
+        missing = set(args.ids) - {task['id'] for task in tasks}
+        if missing or not args.ids:
+            emit('error', message=f'Задачи не найдены: {sorted(missing)}' if missing else 'Укажите id задач или --all')
+            return 2
+        tasks = [task for task in tasks if task['id'] in args.ids]
+    return 0 if asyncio.run(run(args, tasks)) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
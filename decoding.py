@@ -0,0 +1,52 @@
+import asyncio
+import json
+from typing import Any, List, Optional, TypedDict
+
+from products import PRODUCT_KEYS
+
+# крупные ответы разбираются в пуле потоков, чтобы не задерживать event loop с остальными запросами
+DECODE_IN_THREAD_BYTES = 256 * 1024
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if msgspec is not None:
+    # схема ответа вб: из товаров берутся только выгружаемые поля, остальные пропускаются без разбора
+    Product = TypedDict('Product', {key: Any for key in PRODUCT_KEYS}, total=False)
+
+    class PageData(TypedDict, total=False):
+        products: Optional[List[Product]]
+        total: Any
+
+    class Page(TypedDict, total=False):
+        data: Optional[PageData]
+
+    _decoder = msgspec.json.Decoder(Page)
+    decode = _decoder.decode
+    DECODER = 'msgspec'
+elif orjson is not None:
+    decode = orjson.loads
+    DECODER = 'orjson'
+else:
+    decode = json.loads
+    DECODER = 'json'
+
+
+def decode_page(body: bytes) -> dict:
+    """ответ страницы каталога в словарь {'data': {'products': [...], 'total': ...}}.
+    Ошибки разбора - ValueError, как у json.loads"""
+    return decode(body)
+
+
+async def decode_page_async(body: bytes) -> dict:
+    """разбор страницы; большие ответы - вне потока event loop"""
+    if len(body) < DECODE_IN_THREAD_BYTES:
+        return decode_page(body)
+    return await asyncio.get_running_loop().run_in_executor(None, decode_page, body)
@@ -0,0 +1,84 @@
+import hashlib
+import os
+import struct
+from array import array
+
+from products import FIELDS
+
+FINGERPRINTS_DIR = 'fingerprints'
+CHANGE_FIELD = 'Изменение'
+ADDED, CHANGED, REMOVED = 'добавлен', 'изменен', 'удален'
+# поля, изменение которых считается изменением товара
+TRACKED_FIELDS = [FIELDS.index(name) for name in (
+    'Цена', 'Цена со скидкой', 'Скидка', 'Рейтинг', 'Кол-во отзывов', 'Рейтинг отзывов'
+)]
+
+
+def fingerprint(row: tuple) -> int:
+    """64-битный отпечаток отслеживаемых полей товара"""
+    values = '|'.join(str(row[index]) for index in TRACKED_FIELDS).encode()
+    return struct.unpack('<q', hashlib.blake2b(values, digest_size=8).digest())[0]
+
+
+class FingerprintIndex:
+    """отпечатки товаров последнего запуска задачи: id -> хэш, на диске два массива int64"""
+
+    def __init__(self, task_key: str, folder: str = FINGERPRINTS_DIR):
+        name = hashlib.sha1(task_key.encode()).hexdigest()
+        self.path = os.path.join(folder, f'{name}.bin')
+        self.fingerprints = {}
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as file:
+                ids = array('q')
+                hashes = array('q')
+                count = struct.unpack('<q', file.read(8))[0]
+                ids.fromfile(file, count)
+                hashes.fromfile(file, count)
+        except (FileNotFoundError, EOFError, struct.error):
+            return self
+        self.fingerprints = dict(zip(ids, hashes))
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(struct.pack('<q', len(self.fingerprints)))
+            array('q', self.fingerprints.keys()).tofile(file)
+            array('q', self.fingerprints.values()).tofile(file)
+        os.replace(tmp_path, self.path)
+
+
+class DeltaSink:
+    """пропускает в выгрузку только добавленные, измененные и удаленные с прошлого запуска товары"""
+
+    def __init__(self, sink, index: FingerprintIndex):
+        self.sink = sink
+        self.index = index
+        self.previous = index.fingerprints
+        self.current = {}
+        self.counts = {ADDED: 0, CHANGED: 0, REMOVED: 0}
+
+    def write(self, row: tuple):
+        product_id = row[0]
+        current = self.current[product_id] = fingerprint(row)
+        previous = self.previous.get(product_id)
+        if previous == current:
+            return
+        change = ADDED if previous is None else CHANGED
+        self.counts[change] += 1
+        self.sink.write(row + (change,))
+
+    def finish(self):
+        """дописываем исчезнувшие товары (известен только id) и запоминаем новые отпечатки"""
+        empty = (None,) * (len(FIELDS) - 1)
+        for product_id in self.previous.keys() - self.current.keys():
+            self.counts[REMOVED] += 1
+            self.sink.write((product_id,) + empty + (REMOVED,))
+        self.index.fingerprints = self.current
+
+    def summary(self) -> str:
+        return f'Изменения с прошлого запуска: добавлено {self.counts[ADDED]}, ' \
+               f'изменено {self.counts[CHANGED]}, удалено {self.counts[REMOVED]}'
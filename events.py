@@ -0,0 +1,120 @@
+import queue
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# kind: 'log' (data - строка), 'progress' (data - словарь приращений счетчиков), 'finished' (data - итог запуска),
+# 'metrics' (data - метрики запуска по этапам, см. metrics.RunMetrics.as_dict)
+Event = namedtuple('Event', ['task_id', 'kind', 'data'])
+
+PROGRESS_FIELDS = ('pages', 'planned', 'products', 'retries', 'failed', 'bytes')
+
+
+def report_progress(log_output, **counters):
+    """приращение счетчиков прогресса, если лог их принимает"""
+    progress = getattr(log_output, 'progress', None)
+    if progress is not None:
+        progress(**counters)
+
+
+def report_timing(log_output, stage: str, seconds: float):
+    """длительность этапа запуска, если лог ее принимает"""
+    timing = getattr(log_output, 'timing', None)
+    if timing is not None:
+        timing(stage, seconds)
+
+
+def report_metrics(log_output, metrics: dict):
+    """итоговые метрики запуска, если лог их принимает"""
+    receiver = getattr(log_output, 'metrics', None)
+    if receiver is not None:
+        receiver(metrics)
+
+
+@contextmanager
+def timed(log_output, stage: str):
+    """замер этапа: with timed(log_output, 'export'): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        report_timing(log_output, stage, time.perf_counter() - start)
+
+
+class ConsoleLog:
+    """лог в консоль для запуска без интерфейса"""
+
+    def append(self, text: str):
+        print(text, flush=True)
+
+
+class TaskChannel:
+    """канал одной задачи: лог и прогресс уходят в общую очередь, а не напрямую в виджеты"""
+
+    def __init__(self, channel, task_id, name: str):
+        self.channel = channel
+        self.task_id = task_id
+        self.name = name
+        self.started = time.time()
+
+    def append(self, text: str):
+        self.channel.put(Event(self.task_id, 'log', f'[{self.name}] {text}'))
+
+    def progress(self, **counters):
+        self.channel.put(Event(self.task_id, 'progress', counters))
+
+    def metrics(self, metrics: dict):
+        self.channel.put(Event(self.task_id, 'metrics', metrics))
+
+    def finished(self, status: str, error: str = None):
+        self.channel.put(Event(self.task_id, 'finished', {
+            'status': status,
+            'error': error,
+            'duration': time.time() - self.started
+        }))
+
+
+class EventChannel:
+    """потокобезопасная очередь событий от парсера к интерфейсу"""
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+
+    def put(self, event: Event):
+        self.queue.put(event)
+
+    def append(self, text: str):
+        self.put(Event(None, 'log', text))
+
+    def for_task(self, task_id, name: str) -> TaskChannel:
+        return TaskChannel(self, task_id, name)
+
+    def drain(self, limit: int = 10000) -> list:
+        """забираем накопившиеся события пачкой"""
+        events = []
+        while len(events) < limit:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+
+def coalesce(events: list):
+    """склейка пачки событий: строки лога одним текстом, прогресс суммой по задачам"""
+    lines = []
+    progress = {}
+    finished = {}
+    metrics = {}
+    for event in events:
+        if event.kind == 'log':
+            lines.append(event.data)
+        elif event.kind == 'progress':
+            totals = progress.setdefault(event.task_id, dict.fromkeys(PROGRESS_FIELDS, 0))
+            for key, value in event.data.items():
+                totals[key] = totals.get(key, 0) + value
+        elif event.kind == 'finished':
+            finished[event.task_id] = event.data
+        elif event.kind == 'metrics':
+            metrics[event.task_id] = event.data
+    return lines, progress, finished, metrics
@@ -0,0 +1,234 @@
+import asyncio
+import csv
+import os
+import time
+
+from products import DERIVED_COLUMNS, FIELDS, ProductColumns, derived_values
+from regions import merge_regions
+
+DEFAULT_FORMATS = 'xlsx'
+# ширина столбцов итогового excel файла в порядке FIELDS, дополнительных полей и производных колонок
+EXCEL_WIDTHS = [10, 34, 8, 9, 4, 10, 5, 25, 10, 11, 13, 19, 19]
+EXCEL_EXTRA_WIDTH = 12
+EXCEL_DERIVED_WIDTHS = [9, 67]
+# колонка для сортировки по желанию (sort_by_discount); по умолчанию строки идут в порядке выдачи вб
+SORT_COLUMN = 'Глубина скидки, %'
+
+
+def parse_formats(formats) -> list:
+    """список форматов из строки вида 'xlsx, csv'"""
+    if isinstance(formats, str):
+        formats = formats.replace(';', ',').split(',')
+    result = []
+    for fmt in formats or []:
+        fmt = fmt.strip().lower().lstrip('.')
+        if fmt not in EXPORTERS:
+            raise ValueError(f'Неизвестный формат выгрузки: {fmt}')
+        if fmt not in result:
+            result.append(fmt)
+    return result or [DEFAULT_FORMATS]
+
+
+class Exporter:
+    """выгрузка в один файл; потоковые пишут строки по мере поступления, остальные - все колонки в конце"""
+    extension = ''
+    streaming = False
+
+    def __init__(self, path: str, fields: list = FIELDS):
+        self.path = path
+        self.fields = fields
+        self.seconds = 0.0
+
+    def write(self, row: tuple):
+        pass
+
+    def write_dataframe(self, df):
+        """выгрузка готовой таблицы (колонки - fields и производные колонки)"""
+        pass
+
+    def commit(self):
+        """файл записан полностью"""
+        pass
+
+    def abort(self):
+        pass
+
+
+class CsvExporter(Exporter):
+    """потоковая выгрузка в csv (разделитель ';' и BOM, чтобы файл сразу открывался в excel).
+    Строки пишутся в .part рядом, прошлый файл заменяется только после успешного запуска"""
+    extension = 'csv'
+    streaming = True
+
+    def __init__(self, path: str, fields: list = FIELDS):
+        super().__init__(path, fields)
+        start = time.perf_counter()
+        self.part_path = f'{path}.part'
+        self.file = open(self.part_path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file, delimiter=';')
+        self.writer.writerow(fields + DERIVED_COLUMNS)
+        self.seconds += time.perf_counter() - start
+
+    def write(self, row: tuple):
+        start = time.perf_counter()
+        self.writer.writerow(row + derived_values(row))
+        self.seconds += time.perf_counter() - start
+
+    def write_dataframe(self, df):
+        start = time.perf_counter()
+        df.to_csv(self.file, sep=';', header=False, index=False)
+        self.seconds += time.perf_counter() - start
+
+    def commit(self):
+        start = time.perf_counter()
+        self.file.close()
+        os.replace(self.part_path, self.path)
+        self.seconds += time.perf_counter() - start
+
+    def abort(self):
+        if not self.file.closed:
+            self.file.close()
+        # после commit() файла .part уже нет
+        try:
+            os.remove(self.part_path)
+        except FileNotFoundError:
+            pass
+
+
+class ExcelExporter(Exporter):
+    """выгрузка в excel с прежними размерами столбцов"""
+    extension = 'xlsx'
+
+    def write_dataframe(self, df):
+        import pandas as pd
+
+        start = time.perf_counter()
+        writer = pd.ExcelWriter(self.path, engine='xlsxwriter')
+        df.to_excel(writer, sheet_name='data', index=False)
+        # указываем размеры каждого столбца в итоговом файле
+        widths = EXCEL_WIDTHS + [EXCEL_EXTRA_WIDTH] * (len(self.fields) - len(FIELDS)) + EXCEL_DERIVED_WIDTHS
+        for column, width in enumerate(widths):
+            writer.sheets['data'].set_column(column, column + 1, width=width)
+        writer.close()
+        self.seconds += time.perf_counter() - start
+
+
+class ParquetExporter(Exporter):
+    """выгрузка в parquet для аналитики (нужен pyarrow)"""
+    extension = 'parquet'
+
+    def write_dataframe(self, df):
+        start = time.perf_counter()
+        df.to_parquet(self.path, index=False)
+        self.seconds += time.perf_counter() - start
+
+
+class FeatherExporter(Exporter):
+    """выгрузка в feather для аналитики (нужен pyarrow)"""
+    extension = 'feather'
+
+    def write_dataframe(self, df):
+        start = time.perf_counter()
+        df.to_feather(self.path)
+        self.seconds += time.perf_counter() - start
+
+
+EXPORTERS = {exporter.extension: exporter for exporter in (ExcelExporter, CsvExporter, ParquetExporter, FeatherExporter)}
+
+
+def warm_up():
+    """заранее загружаем pandas в процессе выгрузки, пока идет сбор страниц"""
+    import pandas  # noqa: F401
+
+
+def postprocess(df, sort_by_discount: bool = False):
+    """обработка таблицы перед выгрузкой: без повторов id; по желанию - сначала самые глубокие скидки"""
+    df = df.drop_duplicates('id')
+    if sort_by_discount:
+        df = df.sort_values(SORT_COLUMN, ascending=False, kind='stable', na_position='last', ignore_index=True)
+    return df
+
+
+def export_tables(targets: list, packed: dict, regional: bool = False, sort_by_discount: bool = False) -> tuple:
+    """подготовка и запись таблицы, выполняется в пуле процессов.
+    targets - [(формат, путь, поля)], packed - {регион: ProductColumns.pack()}, для regional - сводная по регионам.
+    Возвращает число строк, время подготовки и время записи каждого формата"""
+    start = time.perf_counter()
+    tables = {dest: ProductColumns.unpack(data) for dest, data in packed.items()}
+    df = merge_regions(tables) if regional else next(iter(tables.values())).to_dataframe()
+    df = postprocess(df, sort_by_discount)
+    prepared = time.perf_counter() - start
+    exporters = [EXPORTERS[extension](path, fields) for extension, path, fields in targets]
+    try:
+        for exporter in exporters:
+            exporter.write_dataframe(df)
+        for exporter in exporters:
+            exporter.commit()
+    finally:
+        for exporter in exporters:
+            exporter.abort()
+    return len(df), prepared, [exporter.seconds for exporter in exporters]
+
+
+class ExportSink:
+    """приемник строк товаров для всех выбранных форматов выгрузки;
+    sort_by_discount - таблицы, которые пишутся целиком, сортируются по глубине скидки (потоковый csv - нет)"""
+
+    def __init__(self, filename: str, save_path: str = '', formats=DEFAULT_FORMATS, extra_fields: tuple = (),
+                 sort_by_discount: bool = False):
+        if save_path:
+            os.makedirs(save_path, exist_ok=True)
+        self.sort_by_discount = sort_by_discount
+        fields = FIELDS + list(extra_fields)
+        self.exporters = []
+        self.products = None
+        for fmt in parse_formats(formats):
+            exporter = EXPORTERS[fmt]
+            self.exporters.append(exporter(os.path.join(save_path or '', f'{filename}.{exporter.extension}'), fields))
+            if not exporter.streaming:
+                self.products = self.products or ProductColumns(extra_fields)
+        self.streaming = [exporter for exporter in self.exporters if exporter.streaming]
+
+    def needs_table(self, regional: bool = False) -> bool:
+        """собирается ли таблица целиком при закрытии: есть не потоковые форматы или это сводная по регионам"""
+        return regional or self.products is not None
+
+    def write(self, row: tuple):
+        if self.products is not None:
+            self.products.write(row)
+        for exporter in self.streaming:
+            exporter.write(row)
+
+    async def close(self, log_output, pool=None, tables: dict = None):
+        """дописываем все файлы и сообщаем время выгрузки каждого формата.
+        Таблица собирается и пишется в pool (None - пул потоков), event loop тем временем обслуживает другие задачи.
+        tables - колонки по регионам для сводной таблицы вместо строк, прошедших через приемник"""
+        try:
+            regional = tables is not None
+            if not regional:
+                tables = {None: self.products} if self.products is not None else {}
+            # потоковые форматы уже записаны, если строки шли через приемник; сводная пишется целиком
+            pending = [exporter for exporter in self.exporters if regional or not exporter.streaming]
+            if regional:
+                for exporter in self.streaming:
+                    exporter.abort()
+            if pending:
+                targets = [(exporter.extension, exporter.path, exporter.fields) for exporter in pending]
+                packed = {dest: products.pack() for dest, products in tables.items()}
+                count, prepared, seconds = await asyncio.get_running_loop().run_in_executor(
+                    pool, export_tables, targets, packed, regional, self.sort_by_discount)
+                log_output.append(f'Подготовка таблицы: {count} строк, {round(prepared, 2)} c')
+                for exporter, spent in zip(pending, seconds):
+                    exporter.seconds += spent
+            # прошлые csv заменяются, только когда все форматы выгружены
+            if not regional:
+                for exporter in self.streaming:
+                    exporter.commit()
+            for exporter in self.exporters:
+                log_output.append(f'Все сохранено в {exporter.path} ({exporter.extension}: {round(exporter.seconds, 2)} c)')
+        finally:
+            self.abort()
+
+    def abort(self):
+        for exporter in self.exporters:
+            exporter.abort()
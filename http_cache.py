@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+CACHE_PATH = 'response_cache.db'
+CACHE_TTL = 30 * 60  # сколько секунд ответ считается свежим
+CACHE_MAX_BYTES = 500 * 2 ** 20  # предельный размер сжатых ответов в кэше
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+def cache_key(url: str) -> str:
+    """адрес запроса без учета порядка параметров: раздел, query категории, страница, priceU, скидка"""
+    parts = urlsplit(url)
+    return f'{parts.netloc}{parts.path}?{urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))}'
+
+
+class ResponseCache:
+    """кэш ответов catalog.wb.ru на диске: сжатые тела, TTL и вытеснение давно не читанных (LRU)"""
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = CACHE_TTL, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.total_bytes = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, url: str) -> bytes:
+        """тело ответа или None, если его нет или оно устарело"""
+        key = cache_key(url)
+        now = time.time()
+        with self._lock, self.connection:
+            row = self.connection.execute('SELECT body, size, created FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None or now - row[2] > self.ttl:
+                if row is not None:
+                    self.connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    self.total_bytes -= row[1]
+                return None
+            self.connection.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+        return zlib.decompress(row[0])
+
+    def put(self, url: str, body: bytes):
+        key = cache_key(url)
+        compressed = zlib.compress(body, 6)
+        now = time.time()
+        with self._lock, self.connection:
+            old = self.connection.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses (key, body, size, created, accessed) VALUES (?, ?, ?, ?, ?)',
+                (key, compressed, len(compressed), now, now)
+            )
+            self.total_bytes += len(compressed) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """удаляем давно не читанные ответы, пока кэш не станет меньше 90% лимита"""
+        target = self.max_bytes * 0.9
+        rows = self.connection.execute('SELECT key, size FROM responses ORDER BY accessed').fetchall()
+        evicted = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            evicted.append((key,))
+            self.total_bytes -= size
+        self.connection.executemany('DELETE FROM responses WHERE key = ?', evicted)
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
@@ -1,9 +1,13 @@
+import multiprocessing
+
 from PyQt5.QtGui import QFont
 from PyQt5.QtWidgets import QApplication
 from main_win import MainWindow
 
 
 if __name__ == '__main__':
+    # пул процессов выгрузки в собранном exe
+    multiprocessing.freeze_support()
     app = QApplication([])
     app.setFont(QFont("Arial", 13))
     aw = MainWindow()
@@ -1,49 +1,47 @@
-import asyncio
 import datetime
-from PyQt5.QtCore import pyqtSlot, QThreadPool, QRunnable
+from PyQt5.QtCore import QSortFilterProxyModel, Qt, QTimer
 from PyQt5.QtGui import QTextCursor
-from PyQt5.QtWidgets import QStyledItemDelegate, QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QAbstractItemView, \
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTableView, QPushButton, QAbstractItemView, \
     QTabWidget, QFormLayout, QLabel, QLineEdit, QFileDialog, QHBoxLayout, \
-    QHeaderView, QTextEdit
-from manager import CRUDManager
-from parser import parser
+    QHeaderView, QTextEdit, QSpinBox, QCheckBox
+from events import EventChannel, coalesce
+from exporters import DEFAULT_FORMATS
+from manager import CRUDManager, TaskRegistry, WRITE_DELAY
+from metrics import METRICS_DIR
+from parser import CrawlContext
+from periodic import PeriodicScheduler
+from runner import TaskRunner
 from task_dialog import TaskDialog
+from task_model import PROGRESS_COLUMN, SORT_ROLE, ProgressDelegate, TaskTableModel
 
 
-class ReadOnlyDelegate(QStyledItemDelegate):
-    def createEditor(self, parent, option, index):
-        return
-
-
-class Worker(QRunnable):
-    def __init__(self, function, *args, **kwargs):
-        super().__init__()
-        self.function = function
-        self.args = args
-        self.kwargs = kwargs
-
-    @pyqtSlot()
-    def run(self):
-        try:
-            asyncio.run(self.function(*self.args, **self.kwargs))
-        except Exception as e:
-            print(e)
+LOG_MAX_LINES = 5000  # сколько строк лога хранить в окне
+EVENTS_INTERVAL = 200  # как часто забирать события парсера, мс
+SCHEDULE_INTERVAL = 30 * 1000  # как часто проверять расписание задач, мс
 
 
 class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
-        self.crud_tasks = CRUDManager('tasks.json', [])
-        self.crud_config = CRUDManager('config.json', {'default_folder': ""})
-        self.tasks = self.crud_tasks.read()
+        # изменения задач и настроек пишутся на диск пачкой, не чаще раза в WRITE_DELAY
+        self.crud_tasks = CRUDManager('tasks.json', [], write_delay=WRITE_DELAY)
+        self.crud_config = CRUDManager('config.json', {'default_folder': ""}, write_delay=WRITE_DELAY)
+        self.registry = TaskRegistry(self.crud_tasks)
+        self.tasks = self.registry.tasks
         self.set_appear()
         self.init_ui()
         self.connections()
-        self.update_task_table()
         self.show()
 
     def init_ui(self):
-        self.thread_pool = QThreadPool()
+        self.runner = TaskRunner(CrawlContext(
+            cache_ttl=self.cache_ttl() * 60,
+            metrics_dir=METRICS_DIR if self.crud_config.read().get('save_metrics') else None
+        ))
+        self.channel = EventChannel()
+        self.events_timer = QTimer(self)
+        self.scheduler = PeriodicScheduler()
+        self.schedule_timer = QTimer(self)
         # Создание виджета вкладок
         self.main_layout = QVBoxLayout()
         self.tab_widget = QTabWidget()
@@ -54,24 +52,15 @@ class MainWindow(QWidget):
         self.tasks_tab.setLayout(self.tasks_layout)
 
         # Создание таблицы "Список задач" на вкладке "Задачи"
-        self.task_table = QTableWidget()
-
-        delegate = ReadOnlyDelegate(self.task_table)
-        [self.task_table.setItemDelegateForColumn(i, delegate) for i in range(7)]
+        self.task_model = TaskTableModel(self.registry, self)
+        self.sorted_tasks = QSortFilterProxyModel(self)
+        self.sorted_tasks.setSourceModel(self.task_model)
+        self.sorted_tasks.setSortRole(SORT_ROLE)
+        self.task_table = QTableView()
+        self.task_table.setModel(self.sorted_tasks)
+        self.task_table.setItemDelegateForColumn(PROGRESS_COLUMN, ProgressDelegate(self.task_table))
 
-        self.task_table.setColumnCount(7)
         self.task_table.verticalHeader().setDefaultSectionSize(50)
-        self.task_table.setHorizontalHeaderLabels(
-            [
-             'id',
-             "Название",
-             "Ссылка",
-             "Мин. цена",
-             "Макс. цена",
-             "Мин. скидка",
-             "Последнее обновление"
-            ]
-        )
         self.task_table.setColumnWidth(0, 20)
         self.task_table.setColumnWidth(1, 210)
         self.task_table.setColumnWidth(2, 220)
@@ -79,6 +68,7 @@ class MainWindow(QWidget):
         self.task_table.setColumnWidth(4, 110)
         self.task_table.setColumnWidth(5, 110)
         self.task_table.setColumnWidth(6, 190)
+        self.task_table.setColumnWidth(7, 240)
         self.task_table.horizontalHeader().setSectionResizeMode(6, QHeaderView.Stretch)
         self.task_table.setSelectionBehavior(QAbstractItemView.SelectRows)
 
@@ -99,12 +89,12 @@ class MainWindow(QWidget):
             padding: 10px 20px;
         }"""
         self.table_style = """
-        QTableWidget {
+        QTableView {
             background-color: #ffffff;
             border: 1px solid #d9d9d9;
         }
 
-        QTableWidget::item {
+        QTableView::item {
             padding: 5px;
             border: 1px solid #d9d9d9;
             background-color: #f3f3f3;
@@ -121,7 +111,7 @@ class MainWindow(QWidget):
         QPushButton:hover {
             background-color: #005ea8;
         }
-        QTableWidget::item:selected {
+        QTableView::item:selected {
             background-color: #007acc;
             color: #ffffff;
         }
@@ -130,10 +120,12 @@ class MainWindow(QWidget):
         # Установка стилей для таблицы и кнопки
         self.task_table.setStyleSheet(self.table_style)
         self.task_table.setSortingEnabled(True)
+        self.task_table.sortByColumn(0, Qt.AscendingOrder)
 
         self.tasks_layout.addWidget(self.task_table)
         self.log_text_edit = QTextEdit()
         self.log_text_edit.setReadOnly(True)
+        self.log_text_edit.document().setMaximumBlockCount(LOG_MAX_LINES)
         self.log_text_edit.moveCursor(QTextCursor.End)
         self.tasks_layout.addWidget(self.log_text_edit)
 
@@ -147,8 +139,16 @@ class MainWindow(QWidget):
         self.start_task_button = QPushButton("Запустить задачу")
         self.start_task_button.setStyleSheet(self.start_btn_style)
 
+        self.start_all_button = QPushButton("Запустить все")
+        self.start_all_button.setStyleSheet(self.start_btn_style)
+
+        self.stop_task_button = QPushButton("Остановить задачу")
+        self.stop_task_button.setStyleSheet(self.del_btn_style)
+
         self.buttons_layout = QHBoxLayout()
         self.buttons_layout.addWidget(self.start_task_button)
+        self.buttons_layout.addWidget(self.start_all_button)
+        self.buttons_layout.addWidget(self.stop_task_button)
         self.buttons_layout.addWidget(self.add_task_button)
         self.buttons_layout.addWidget(self.del_task_button)
         self.tasks_layout.addLayout(self.buttons_layout)
@@ -171,6 +171,17 @@ class MainWindow(QWidget):
         form_layout.addRow(folder_label, self.default_folder_input)
         form_layout.addRow(self.folder_button)
 
+        # Срок жизни кэша ответов вб, 0 - не кэшировать
+        self.cache_ttl_input = QSpinBox()
+        self.cache_ttl_input.setRange(0, 24 * 60)
+        self.cache_ttl_input.setValue(self.cache_ttl())
+        form_layout.addRow(QLabel("Кэш ответов, мин (0 - выкл.):"), self.cache_ttl_input)
+
+        # Сохранение метрик запусков в json
+        self.save_metrics_checkbox = QCheckBox(f"Сохранять метрики запусков в папку {METRICS_DIR}")
+        self.save_metrics_checkbox.setChecked(bool(self.crud_config.read().get('save_metrics')))
+        form_layout.addRow(self.save_metrics_checkbox)
+
 
         # settings_layout.addWidget(self.auto_start_checkbox_default)
         settings_layout.addLayout(form_layout)
@@ -189,8 +200,16 @@ class MainWindow(QWidget):
         self.add_task_button.clicked.connect(self.create_task)
         self.del_task_button.clicked.connect(self.delete_task)
         self.start_task_button.clicked.connect(self.start_task)
+        self.start_all_button.clicked.connect(self.start_all_tasks)
+        self.stop_task_button.clicked.connect(self.stop_task)
         self.folder_button.clicked.connect(self.choose_default_folder)
-        self.task_table.itemDoubleClicked.connect(self.edit_task)
+        self.cache_ttl_input.valueChanged.connect(self.change_cache_ttl)
+        self.save_metrics_checkbox.toggled.connect(self.change_save_metrics)
+        self.task_table.doubleClicked.connect(self.edit_task)
+        self.events_timer.timeout.connect(self.drain_events)
+        self.events_timer.start(EVENTS_INTERVAL)
+        self.schedule_timer.timeout.connect(self.run_scheduled_tasks)
+        self.schedule_timer.start(SCHEDULE_INTERVAL)
 
     def create_task(self):
         dialog = TaskDialog({
@@ -201,39 +220,23 @@ class MainWindow(QWidget):
             "discount": 0,
         })
         if dialog.exec_():
-            # Получаем данные из диалогового окна
-            task_data = dialog.get_task_data()
-            # Добавляем новую задачу в список задач
-            task_data['id'] = self.tasks[-1]['id'] + 1 if len(self.tasks) > 0 else 1
-            self.tasks.append(task_data)
-            # Обновляем JSON файл с задачами
-            self.crud_tasks.update(self.tasks)
-            # Обновляем таблицу задач
-            self.update_task_table()
-
-    def edit_task(self, item):
-        row = item.row()
+            # Получаем данные из диалогового окна и добавляем новую задачу в таблицу (id назначает реестр)
+            self.task_model.add_task(dialog.get_task_data())
+
+    def edit_task(self, index):
         # Получаем id задачи, на которую был сделан двойной клик
-        task_id = int(self.task_table.item(row, 0).text())
-        current_task = next((task for task in self.tasks if task["id"] == task_id), None)
+        task_id = self.task_model.task_id(self.sorted_tasks.mapToSource(index).row())
+        current_task = self.registry.get(task_id)
         if current_task:
+            # диалог меняет задачу на месте
             dialog = TaskDialog(current_task)
             if dialog.exec_():
-                # Обновляем данные задачи после редактирования
-                updated_task = dialog.get_task_data()
-                index = self.tasks.index(current_task)
-                self.tasks[index] = updated_task
-                self.crud_tasks.update(self.tasks)
-                self.update_task_table()
+                self.task_model.task_changed(task_id)
 
     def delete_task(self):
-        selected_item = self.task_table.selectedItems()
-        if len(selected_item) > 0:
-            task_id = self.task_table.item(selected_item[0].row(), 0).text()
-            current_task = list(filter(lambda t: t['id'] == int(task_id), self.tasks))[0]
-            self.tasks.remove(current_task)
-            self.crud_tasks.update(self.tasks)
-            self.update_task_table()
+        selected = self.selected_tasks()
+        if selected:
+            self.task_model.remove_task(selected[0]['id'])
 
     def choose_default_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Выберите папку")
@@ -244,36 +247,95 @@ class MainWindow(QWidget):
             except Exception as e:
                 print(e)
 
-    def update_task_table(self):
-        self.task_table.setRowCount(len(self.tasks))
-        for row, task in enumerate(self.tasks):
-            self.task_table.setItem(row, 0, QTableWidgetItem(str(task["id"])))
-            self.task_table.setItem(row, 1, QTableWidgetItem(task["name"]))
-            self.task_table.setItem(row, 2, QTableWidgetItem(task["link"]))
-            self.task_table.setItem(row, 3, QTableWidgetItem(str(task["low_price"])))
-            self.task_table.setItem(row, 4, QTableWidgetItem(str(task["top_price"])))
-            self.task_table.setItem(row, 5, QTableWidgetItem(str(task["discount"])))
-            self.task_table.setItem(row, 6, QTableWidgetItem(task["last_update"]))
+    def cache_ttl(self) -> int:
+        return int(self.crud_config.read().get('cache_ttl', 0))
+
+    def change_cache_ttl(self, minutes: int):
+        self.crud_config.update_by_key('cache_ttl', minutes)
+        # применяется со следующего запуска задачи
+        self.runner.context.cache_ttl = minutes * 60
+
+    def change_save_metrics(self, checked: bool):
+        self.crud_config.update_by_key('save_metrics', checked)
+        self.runner.context.metrics_dir = METRICS_DIR if checked else None
+
+    def drain_events(self):
+        """забираем события парсера пачкой: один append в лог и одно обновление на задачу"""
+        lines, progress, finished, metrics = coalesce(self.channel.drain())
+        if lines:
+            self.log_text_edit.append('\n'.join(lines))
+        for task_id in set(progress) | set(finished) | set(metrics):
+            self.task_model.add_progress(
+                task_id,
+                progress.get(task_id),
+                finished[task_id]['status'] if task_id in finished else None,
+                metrics.get(task_id)
+            )
+        succeeded = [task_id for task_id, result in finished.items() if result['status'] == 'ok']
+        if succeeded:
+            self.task_succeeded(succeeded, finished)
+
+    def task_succeeded(self, task_ids, finished):
+        """время последнего обновления меняется только после успешного запуска"""
+        for task_id in task_ids:
+            task = self.registry.get(task_id)
+            if task is None:
+                continue
+            task['last_update'] = datetime.datetime.now().strftime('%d.%m.%Y %H:%M')
+            task['last_duration'] = round(finished[task_id]['duration'], 1)
+            self.task_model.task_changed(task_id, save=False)
+        self.registry.save()
+
+    def run_scheduled_tasks(self):
+        for current_task in self.scheduler.due(self.tasks, self.runner.is_running):
+            self.log_text_edit.append(f"Задача {current_task['name']} запускается по расписанию")
+            self.run_task(current_task)
+
+    def selected_tasks(self):
+        rows = sorted(self.sorted_tasks.mapToSource(index).row()
+                      for index in self.task_table.selectionModel().selectedRows())
+        return [self.tasks[row] for row in rows]
 
     def start_task(self):
-        selected_item = self.task_table.selectedItems()
-        if len(selected_item) > 0:
-            task_id = self.task_table.item(selected_item[0].row(), 0).text()
-            current_task = list(filter(lambda t: t['id'] == int(task_id), self.tasks))[0]
+        for current_task in self.selected_tasks():
+            self.run_task(current_task)
+
+    def start_all_tasks(self):
+        for current_task in self.tasks:
+            self.run_task(current_task)
+
+    def run_task(self, current_task):
+        if self.runner.is_running(current_task['id']):
+            self.log_text_edit.append(f"Задача {current_task['name']} уже выполняется")
+            return
+        try:
+            self.task_model.reset_progress(current_task['id'])
+            self.runner.submit(
+                current_task['id'],
+                current_task['name'],
+                self.channel,
+                url=current_task['link'],
+                low_price=int(current_task['low_price']),
+                top_price=int(current_task['top_price']),
+                discount=int(current_task['discount']),
+                save_path=self.default_folder_input.text(),
+                export_formats=current_task.get('export_formats', DEFAULT_FORMATS),
+                delta=current_task.get('delta', False),
+                dests=current_task.get('dests', ''),
+                sort_by_discount=current_task.get('sort_by_discount', False)
+            )
             self.log_text_edit.append(f"Задача {current_task['name']} запущена!")
-            try:
-                worker = Worker(
-                    parser,
-                    log_output=self.log_text_edit,
-                    url=current_task['link'],
-                    low_price=int(current_task['low_price']),
-                    top_price=int(current_task['top_price']),
-                    discount=int(current_task['discount']),
-                    save_path=self.default_folder_input.text()
-                )
-                self.thread_pool.start(worker)
-                current_task['last_update'] = datetime.datetime.now().strftime('%d.%m.%Y %H:%M')
-            except:
-                self.log_text_edit.append(f"Произошла ошибка, проверьте правильность ввода данных.")
-
-            # parser(url=current_task['link'], low_price=current_task['low_price'], top_price=current_task['top_price'], discount=current_task['discount'])
+        except:
+            self.log_text_edit.append(f"Произошла ошибка, проверьте правильность ввода данных.")
+
+    def stop_task(self):
+        for current_task in self.selected_tasks():
+            if self.runner.cancel(current_task['id']):
+                self.log_text_edit.append(f"Задача {current_task['name']} остановлена")
+
+    def closeEvent(self, event):
+        self.events_timer.stop()
+        self.runner.stop()
+        self.crud_tasks.flush()
+        self.crud_config.flush()
+        super().closeEvent(event)
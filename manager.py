@@ -1,36 +1,117 @@
+import atexit
 import json
 import os
+import threading
+
+WRITE_DELAY = 1.0  # сколько ждать перед записью, чтобы несколько изменений подряд сохранились одной записью, сек.
 
 
 class CRUDManager():
-    def __init__(self, file_path, init_data):
+    """json файл с данными в памяти: чтение с диска один раз, запись атомарно (временный файл + замена).
+    При write_delay > 0 запись откладывается и объединяет все изменения за это время; flush() пишет сразу.
+    Текст файла готовится в update(), в потоке, который меняет данные, таймер пишет уже готовый снимок"""
+
+    def __init__(self, file_path, init_data, write_delay: float = 0):
         self.file_path = file_path
+        self.write_delay = write_delay
+        self._data = None
+        self._pending = None  # снимок данных в json, еще не записанный на диск
+        self._timer = None
+        self._lock = threading.RLock()
         if not os.path.exists(self.file_path):
-            file_data = init_data
-            with open(self.file_path, 'w') as file:
-                json.dump(file_data, file, indent=4)
+            self._write(init_data)
+        if write_delay > 0:
+            atexit.register(self.flush)
+
+    def _write(self, data):
+        self._write_text(json.dumps(data, indent=4))
+
+    def _write_text(self, text: str):
+        tmp_path = f'{self.file_path}.tmp'
+        with open(tmp_path, 'w') as file:
+            file.write(text)
+        os.replace(tmp_path, self.file_path)
 
     def read(self):
-        try:
-            with open(self.file_path, 'r') as file:
-                data = json.load(file)
-                return data
-        except FileNotFoundError:
-            return []
+        if self._data is None:
+            try:
+                with open(self.file_path, 'r') as file:
+                    self._data = json.load(file)
+            except FileNotFoundError:
+                return []
+        return self._data
 
     def update(self, new_data):
-        data = new_data
-        with open(self.file_path, 'w') as file:
-            json.dump(data, file, indent=4)
+        with self._lock:
+            self._data = new_data
+            self._pending = json.dumps(new_data, indent=4)
+            if self.write_delay <= 0:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.write_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
         return True
 
+    def flush(self):
+        """записываем отложенные изменения"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._pending is None:
+                return
+            text, self._pending = self._pending, None
+            self._write_text(text)
+
     def update_by_key(self, key, new_data):
         data = self.read()
         data[key] = new_data
-        with open(self.file_path, 'w') as file:
-            json.dump(data, file, indent=4)
-        return True
+        return self.update(data)
 
     def get_by_key(self, key):
         data = self.read()
         return data[key]
+
+
+class TaskRegistry:
+    """задачи в памяти с индексом по id; порядок строк - как в файле задач"""
+
+    def __init__(self, crud: CRUDManager):
+        self.crud = crud
+        self.tasks = crud.read()
+        self.index = {task['id']: task for task in self.tasks}
+        self.rows = {task['id']: row for row, task in enumerate(self.tasks)}
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    def get(self, task_id) -> dict:
+        return self.index.get(task_id)
+
+    def row(self, task_id) -> int:
+        return self.rows.get(task_id)
+
+    def add(self, task: dict) -> int:
+        """новая задача в конец списка; возвращает ее строку"""
+        task['id'] = self.tasks[-1]['id'] + 1 if self.tasks else 1
+        self.tasks.append(task)
+        self.index[task['id']] = task
+        self.rows[task['id']] = len(self.tasks) - 1
+        self.save()
+        return self.rows[task['id']]
+
+    def remove(self, task_id):
+        del self.index[task_id]
+        row = self.rows.pop(task_id)
+        del self.tasks[row]
+        # строки ниже удаленной сдвигаются
+        for task in self.tasks[row:]:
+            self.rows[task['id']] -= 1
+        self.save()
+
+    def save(self):
+        self.crud.update(self.tasks)
@@ -0,0 +1,146 @@
+import datetime
+import json
+import os
+import time
+
+from events import report_metrics, report_progress, report_timing
+
+METRICS_DIR = 'metrics'
+# этапы запуска в порядке выполнения; время страниц суммируется по всем запросам, они идут параллельно
+STAGES = {
+    'catalog': 'каталог',
+    'lookup': 'поиск раздела',
+    'page_wait': 'очередь запросов',
+    'connect': 'установка соединений',
+    'page_network': 'сеть',
+    'page_decode': 'разбор json',
+    'extract': 'извлечение товаров',
+    'export': 'выгрузка',
+}
+PAGE_STAGES = ('page_wait', 'page_network', 'page_decode')
+
+_hooks = []
+
+
+def register_hook(callback):
+    """подписка на метрики всех запусков: callback(kind, name, value),
+    kind - 'timing' (этап и секунды), 'progress' (счетчик и приращение) или 'finish' (задача и as_dict())"""
+    if callback not in _hooks:
+        _hooks.append(callback)
+
+
+def unregister_hook(callback):
+    if callback in _hooks:
+        _hooks.remove(callback)
+
+
+class RunMetrics:
+    """метрики одного запуска: длительность этапов (количество, сумма, максимум) и счетчики"""
+
+    def __init__(self, task: str = ''):
+        self.task = task
+        self.started = time.time()
+        self.seconds = None
+        self.ok = None
+        self.stages = {}  # этап -> [количество, сумма секунд, максимум]
+        self.counters = {}
+        self.hook_errors = []
+
+    def _notify(self, kind: str, name: str, value):
+        for hook in list(_hooks):
+            try:
+                hook(kind, name, value)
+            except Exception as e:
+                # ошибка подписчика не должна останавливать сбор
+                if len(self.hook_errors) < 10:
+                    self.hook_errors.append(repr(e))
+
+    def timing(self, stage: str, seconds: float):
+        span = self.stages.setdefault(stage, [0, 0.0, 0.0])
+        span[0] += 1
+        span[1] += seconds
+        span[2] = max(span[2], seconds)
+        self._notify('timing', stage, seconds)
+
+    def progress(self, **counters):
+        for key, value in counters.items():
+            # planned - оценка числа страниц, а не выполненная работа
+            if key != 'planned':
+                self.counters[key] = self.counters.get(key, 0) + value
+                self._notify('progress', key, value)
+
+    def finish(self, ok: bool):
+        self.ok = ok
+        self.seconds = time.time() - self.started
+        self._notify('finish', self.task, self.as_dict())
+
+    def as_dict(self) -> dict:
+        data = {
+            'task': self.task,
+            'started': datetime.datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'seconds': round(self.seconds if self.seconds is not None else time.time() - self.started, 3),
+            'ok': self.ok,
+            'stages': {stage: {'count': count, 'seconds': round(total, 4), 'max': round(longest, 4)}
+                       for stage, (count, total, longest) in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+        if self.hook_errors:
+            data['hook_errors'] = self.hook_errors
+        return data
+
+    def summary(self) -> str:
+        parts = [f'{STAGES.get(stage, stage)} {round(self.stages[stage][1], 2)}'
+                 for stage in list(STAGES) + sorted(self.stages.keys() - STAGES.keys()) if stage in self.stages]
+        text = f'Этапы, c: {", ".join(parts)}'
+        requests = max((self.stages[stage][0] for stage in PAGE_STAGES if stage in self.stages), default=0)
+        if requests:
+            text += f' (время страниц - сумма по {requests} запросам)'
+        return text
+
+    def requests_summary(self, seconds: float) -> str:
+        """запросы этого запуска, без параллельных задач на том же контексте; seconds - длительность сбора"""
+        requests = self.counters.get('requests', 0)
+        rate = requests / seconds if seconds > 0 else 0.0
+        return f'Запросов: {requests}, повторов: {self.counters.get("retries", 0)}, ' \
+               f'ограничений (429): {self.counters.get("throttled", 0)}, скорость: {round(rate, 1)} запр/с'
+
+    def connections_summary(self) -> str:
+        count, total, _ = self.stages.get('connect', (0, 0.0, 0.0))
+        return f'Открыто соединений: {count}, время на установку: {round(total, 2)} c'
+
+    def cache_summary(self) -> str:
+        return f'Кэш ответов: попаданий {self.counters.get("cache_hits", 0)}, ' \
+               f'промахов {self.counters.get("cache_misses", 0)}'
+
+    def save(self, folder: str, filename: str, profiler=None) -> str:
+        """метрики в json и, если был профилировщик, его статистика в .prof рядом"""
+        os.makedirs(folder, exist_ok=True)
+        stamp = datetime.datetime.fromtimestamp(self.started).strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(folder, f'{filename}_{stamp}.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.as_dict(), file, ensure_ascii=False, indent=4)
+        if profiler is not None:
+            profiler.dump_stats(os.path.join(folder, f'{filename}_{stamp}.prof'))
+        return path
+
+
+class MeteredLog:
+    """лог запуска, который попутно собирает метрики; все вызовы передаются исходному логу"""
+
+    def __init__(self, log_output, run_metrics: RunMetrics):
+        self.log_output = log_output
+        self.run_metrics = run_metrics
+
+    def append(self, text: str):
+        self.log_output.append(text)
+
+    def progress(self, **counters):
+        self.run_metrics.progress(**counters)
+        report_progress(self.log_output, **counters)
+
+    def timing(self, stage: str, seconds: float):
+        self.run_metrics.timing(stage, seconds)
+        report_timing(self.log_output, stage, seconds)
+
+    def metrics(self, metrics: dict):
+        report_metrics(self.log_output, metrics)
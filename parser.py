@@ -1,87 +1,159 @@
 import asyncio
+import cProfile
 import datetime
+import multiprocessing
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 import aiohttp
-import requests
-import pandas as pd
-
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/113.0",
-    "Accept": "*/*",
-    "Accept-Language": "ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3",
-    "Accept-Encoding": "gzip, deflate, br",
-    "Origin": "https://www.wildberries.ru",
-    'Content-Type': 'application/json; charset=utf-8',
-    'Transfer-Encoding': 'chunked',
-    "Connection": "keep-alive",
-    'Vary': 'Accept-Encoding',
-    'Content-Encoding': 'gzip',
-    "Sec-Fetch-Dest": "empty",
-    "Sec-Fetch-Mode": "cors",
-    "Sec-Fetch-Site": "cross-site"
-}
-CATALOG_URL = 'https://static-basket-01.wbbasket.ru/vol0/data/main-menu-ru-ru-v2.json'
-
-
-def get_catalogs_wb() -> dict:
-    """получаем полный каталог Wildberries"""
-    return requests.get(CATALOG_URL, headers=HEADERS).json()
-
-
-def get_data_category(catalogs_wb: dict) -> list:
-    """сбор данных категорий из каталога Wildberries"""
-    catalog_data = []
-    if isinstance(catalogs_wb, dict) and 'childs' not in catalogs_wb:
-        catalog_data.append({
-            'name': f"{catalogs_wb['name']}",
-            'shard': catalogs_wb.get('shard', None),
-            'url': catalogs_wb['url'],
-            'query': catalogs_wb.get('query', None)
-        })
-    elif isinstance(catalogs_wb, dict):
-        catalog_data.extend(get_data_category(catalogs_wb['childs']))
-    else:
-        for child in catalogs_wb:
-            catalog_data.extend(get_data_category(child))
-    return catalog_data
-
-
-def search_category_in_catalog(url: str, catalog_list: list) -> dict:
-    """проверка пользовательской ссылки на наличии в каталоге"""
-    for catalog in catalog_list:
-        if catalog['url'] == url.split('https://www.wildberries.ru')[-1]:
-            return catalog
-
-
-def get_data_from_json(json_file: dict) -> list:
-    """извлекаем из json данные"""
-    data_list = []
-    if json_file is not None:
-        for data in json_file['data']['products']:
-            data_list.append({
-                'id': data.get('id'),
-                'Наименование': data.get('name'),
-                'Цена': int(data.get("priceU") / 100),
-                'Цена со скидкой': int(data.get('salePriceU') / 100),
-                'Скидка': data.get('sale'),
-                'Бренд': data.get('brand'),
-                'Рейтинг': data.get('rating'),
-                'Продавец': data.get('supplier'),
-                'Рейтинг продавца': data.get('supplierRating'),
-                'Кол-во отзывов': data.get('feedbacks'),
-                'Рейтинг отзывов': data.get('reviewRating'),
-                'Промо текст карточки': data.get('promoTextCard'),
-                'Промо текст категории': data.get('promoTextCat'),
-                'Ссылка': f'https://www.wildberries.ru/catalog/{data.get("id")}/detail.aspx?targetUrl=BP'
-            })
-    return data_list
-
-
-async def scrap_page(page: int, shard: str, query: str, low_price: int, top_price: int, discount: int = None, log_output = None) -> dict:
+
+from catalog import CatalogCache
+from checkpoint import CHECKPOINTS_DIR, Checkpoint
+from decoding import decode_page_async
+from delta import CHANGE_FIELD, FINGERPRINTS_DIR, DeltaSink, FingerprintIndex
+from events import ConsoleLog, report_metrics, report_progress, report_timing, timed
+from http_cache import CACHE_PATH, ResponseCache
+from metrics import METRICS_DIR, MeteredLog, RunMetrics
+from exporters import DEFAULT_FORMATS, ExportSink, warm_up
+from products import ProductColumns, ProductStream, TeeSink, page_products
+from regions import DEFAULT_DEST, parse_dests, region_column, region_key
+from store import STORE_PATH, ResultStore
+from throttle import RateLimiter, parse_retry_after
+
+CATALOG_API = 'https://catalog.wb.ru/catalog'
+# настройки пула соединений к catalog.wb.ru
+CONNECTION_LIMIT_PER_HOST = 10  # максимум одновременных соединений к одному хосту
+DNS_CACHE_TTL = 300  # время жизни кэша DNS, сек.
+KEEPALIVE_TIMEOUT = 30  # сколько держать простаивающее соединение открытым, сек.
+RETRIES = 5  # повторов одной страницы при 429/5xx и сетевых ошибках
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_PAGES = 50  # вб отдает 50 страниц товара
+PAGE_SIZE = 100  # товаров на одной странице выдачи
+# в одном процессе может работать только один cProfile: до python 3.12 второй enable() молча перехватывает профилирование
+PROFILER_LOCK = threading.Lock()
+
+
+class ConnectionStats:
+    """счетчик установленных соединений (TCP+TLS рукопожатий) за время жизни сессии;
+    соединение, открытое для запроса запуска, попадает и в метрики этого запуска (этап 'connect')"""
+
+    def __init__(self):
+        self.handshakes = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """трассировка aiohttp, считающая новые соединения и время на их установку"""
+        async def on_start(session, ctx, params):
+            ctx.connection_start = time.perf_counter()
+
+        async def on_end(session, ctx, params):
+            seconds = time.perf_counter() - ctx.connection_start
+            self.handshakes += 1
+            # trace_request_ctx - лог запуска, сделавшего запрос
+            report_timing(ctx.trace_request_ctx, 'connect', seconds)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_start.append(on_start)
+        trace_config.on_connection_create_end.append(on_end)
+        return trace_config
+
+
+def create_session(stats: ConnectionStats = None, limit_per_host: int = CONNECTION_LIMIT_PER_HOST,
+                   ttl_dns_cache: int = DNS_CACHE_TTL, keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+                   trace_configs: list = ()) -> aiohttp.ClientSession:
+    """общая сессия с пулом соединений на весь запуск; trace_configs - дополнительные трассировки aiohttp"""
+    connector = aiohttp.TCPConnector(
+        limit_per_host=limit_per_host,
+        ttl_dns_cache=ttl_dns_cache,
+        keepalive_timeout=keepalive_timeout
+    )
+    trace_configs = ([stats.trace_config()] if stats is not None else []) + list(trace_configs)
+    return aiohttp.ClientSession(connector=connector, trace_configs=trace_configs or None)
+
+
+class CrawlContext:
+    """общие для запусков ресурсы: пул соединений, ограничитель запросов, каталог и история результатов"""
+
+    def __init__(self, limiter: RateLimiter = None, catalog: CatalogCache = None, store_path: str = STORE_PATH,
+                 cache_ttl: float = 0, cache_path: str = CACHE_PATH, metrics_dir: str = None, profile: bool = False,
+                 export_workers: int = None, checkpoints_dir: str = CHECKPOINTS_DIR,
+                 fingerprints_dir: str = FINGERPRINTS_DIR):
+        self.connection_stats = ConnectionStats()
+        self.limiter = limiter or RateLimiter()
+        self.catalog = catalog or CatalogCache()
+        self.store_path = store_path
+        self.cache_ttl = cache_ttl  # 0 - кэш ответов выключен
+        self.cache_path = cache_path
+        self.metrics_dir = metrics_dir  # куда сохранять метрики запусков, None - не сохранять
+        self.profile = profile  # профилировать запуски cProfile (.prof рядом с метриками)
+        self.export_workers = export_workers  # процессов для выгрузки, None - по числу ядер, 0 - пул потоков
+        self.checkpoints_dir = checkpoints_dir
+        self.fingerprints_dir = fingerprints_dir
+        self.session = None
+        self.store = None
+        self.cache = None
+        self.export_pool = None
+        # ключи выполняющихся запусков: одинаковые задачи писали бы в одни контрольные точки, отпечатки и файлы
+        self.running_keys = set()
+
+    async def open(self):
+        if self.session is None:
+            # параллельность запросов задает ограничитель; пул меньше его максимума держал бы
+            # запросы, уже получившие слот, в очереди aiohttp за соединением
+            self.session = create_session(self.connection_stats, self.limiter.max_concurrency)
+        if self.store is None and self.store_path:
+            self.store = ResultStore(self.store_path)
+        if self.cache_ttl:
+            if self.cache is None:
+                self.cache = ResponseCache(self.cache_path, ttl=self.cache_ttl)
+            # срок жизни мог измениться в настройках между запусками
+            self.cache.ttl = self.cache_ttl
+
+    def get_export_pool(self):
+        """пул процессов выгрузки создается при первом запуске, которому нужна таблица целиком
+        (для одного потокового csv pandas не нужен); None - выгрузка в пуле потоков"""
+        if self.export_pool is None and self.export_workers != 0:
+            # spawn: дочерние процессы не наследуют потоки event loop и интерфейса
+            self.export_pool = ProcessPoolExecutor(self.export_workers, mp_context=multiprocessing.get_context('spawn'))
+            self.export_pool.submit(warm_up)
+        return self.export_pool
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        if self.export_pool is not None:
+            self.export_pool.shutdown()
+            self.export_pool = None
+
+    def reset_export_pool(self, pool):
+        """сломанный пул (процесс выгрузки аварийно завершился, например по нехватке памяти) больше не принимает
+        задачи; следующая выгрузка создаст новый. Пул, уже пересозданный другой задачей, не трогаем"""
+        if pool is not None and pool is self.export_pool:
+            self.export_pool.shutdown(wait=False, cancel_futures=True)
+            self.export_pool = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+async def scrap_page(session: aiohttp.ClientSession, limiter: RateLimiter, page: int, shard: str, query: str,
+                     low_price: int, top_price: int, discount: int = None, log_output = None,
+                     cache: ResponseCache = None, dest: int = DEFAULT_DEST) -> dict:
     """Сбор данных со страниц"""
-    url = f'https://catalog.wb.ru/catalog/{shard}/catalog?appType=1&curr=rub' \
-          f'&dest=-1257786' \
+    url = f'{CATALOG_API}/{shard}/catalog?appType=1&curr=rub' \
+          f'&dest={dest}' \
           f'&locale=ru' \
           f'&page={page}' \
           f'&priceU={low_price * 100};{top_price * 100}' \
@@ -89,83 +161,358 @@ async def scrap_page(page: int, shard: str, query: str, low_price: int, top_pric
           f'&{query}' \
           f'&discount={discount}'
 
-    async with aiohttp.ClientSession() as session:
-        r = await session.get(url=url)
-        log_output.append(f'[+] Страница {page}')
-        for _ in range(5):
-            if r.status == 200:
-                break
-            r = await session.get(url=url)
-
-        if r.status != 200:
-            return {}
-        return await r.json(content_type=None)
-
-
-def save_excel(data: list, filename: str, log_output):
-    """сохранение результата в excel файл"""
-    df = pd.DataFrame(data)
-    writer = pd.ExcelWriter(f'{filename}.xlsx')
-    df.to_excel(writer, sheet_name='data', index=False)
-    # указываем размеры каждого столбца в итоговом файле
-    writer.sheets['data'].set_column(0, 1, width=10)
-    writer.sheets['data'].set_column(1, 2, width=34)
-    writer.sheets['data'].set_column(2, 3, width=8)
-    writer.sheets['data'].set_column(3, 4, width=9)
-    writer.sheets['data'].set_column(4, 5, width=4)
-    writer.sheets['data'].set_column(5, 6, width=10)
-    writer.sheets['data'].set_column(6, 7, width=5)
-    writer.sheets['data'].set_column(7, 8, width=25)
-    writer.sheets['data'].set_column(8, 9, width=10)
-    writer.sheets['data'].set_column(9, 10, width=11)
-    writer.sheets['data'].set_column(10, 11, width=13)
-    writer.sheets['data'].set_column(11, 12, width=19)
-    writer.sheets['data'].set_column(12, 13, width=19)
-    writer.sheets['data'].set_column(13, 14, width=67)
-    writer.close()
-    log_output.append(f'Все сохранено в {filename}.xlsx\n')
-
-
-async def parser(log_output, url: str, low_price: int = 1, top_price: int = 1000000, discount: int = 0, save_path: str = ''):
-    """основная функция"""
+    body = cache.get(url) if cache is not None else None
+    if body is not None:
+        log_output.append(f'[+] Страница {page} (из кэша)')
+        report_progress(log_output, pages=1, cache_hits=1)
+        return await decode_page_async(body)
+    if cache is not None:
+        report_progress(log_output, cache_misses=1)
+
+    for attempt in range(RETRIES + 1):
+        retry_after = None
+        wait_start = time.perf_counter()
+        async with limiter.slot():
+            report_timing(log_output, 'page_wait', time.perf_counter() - wait_start)
+            report_progress(log_output, requests=1)
+            try:
+                request_start = time.perf_counter()
+                async with session.get(url=url, trace_request_ctx=log_output) as r:
+                    if r.status == 200:
+                        body = await r.read()
+                        decode_start = time.perf_counter()
+                        report_timing(log_output, 'page_network', decode_start - request_start)
+                        data = await decode_page_async(body)
+                        report_timing(log_output, 'page_decode', time.perf_counter() - decode_start)
+                        limiter.on_success()
+                        if cache is not None:
+                            cache.put(url, body)
+                        log_output.append(f'[+] Страница {page}')
+                        report_progress(log_output, pages=1, bytes=len(body))
+                        return data
+                    status = r.status
+                    retry_after = parse_retry_after(r.headers.get('Retry-After'))
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                status = None
+        if status == 429:
+            limiter.on_throttle(retry_after)
+            report_progress(log_output, throttled=1)
+        elif status is not None and status not in RETRY_STATUSES:
+            break
+        if attempt < RETRIES:
+            report_progress(log_output, retries=1)
+            await asyncio.sleep(limiter.backoff(attempt, retry_after))
+    log_output.append(f'[-] Страница {page} не получена')
+    report_progress(log_output, failed=1)
+    return {}
+
+
+def is_capped(total: int, page_sizes: list) -> bool:
+    """выдача уперлась в лимит вб в 50 страниц"""
+    if total:
+        return total > MAX_PAGES * PAGE_SIZE
+    return page_sizes.count(PAGE_SIZE) >= MAX_PAGES
+
+
+async def scrap_pages(session: aiohttp.ClientSession, limiter: RateLimiter, shard: str, query: str,
+                      low_price: int, top_price: int, discount: int = None, log_output = None,
+                      on_page=None, stop_if_capped: bool = False, checkpoint: Checkpoint = None,
+                      cache: ResponseCache = None, dest: int = DEFAULT_DEST) -> tuple:
+    """сбор только существующих страниц раздела: до total из первой страницы или до первой неполной.
+    Каждая страница сразу передается в on_page, наружу возвращаются только total и размеры страниц"""
+    async def fetch(page: int) -> dict:
+        if checkpoint is not None:
+            data = checkpoint.get(low_price, top_price, page)
+            if data is not None:
+                report_progress(log_output, pages=1)
+                return data
+        data = await scrap_page(session=session, limiter=limiter, page=page, shard=shard, query=query,
+                                low_price=low_price, top_price=top_price, discount=discount, log_output=log_output,
+                                cache=cache, dest=dest)
+        if checkpoint is not None and page_products(data) is not None:
+            checkpoint.record(low_price, top_price, page, data)
+        return data
+
+    def handle(data: dict) -> list:
+        products = page_products(data)
+        if products is not None:
+            page_sizes.append(len(products))
+            if on_page is not None:
+                on_page(data)
+        return products
+
+    page_sizes = []
+    report_progress(log_output, planned=1)
+    first = await fetch(1)
+    total = (first.get('data') or {}).get('total') if first else None
+    products = handle(first)
+    if products is not None and len(products) < PAGE_SIZE:
+        log_output.append(f'Страниц в выдаче: {1 if products else 0}')
+        return total, page_sizes
+    if stop_if_capped and is_capped(total, page_sizes):
+        # диапазон все равно будет поделен, остальные страницы не нужны
+        return total, page_sizes
+    last_page = min(MAX_PAGES, -(-total // PAGE_SIZE)) if total else MAX_PAGES
+    report_progress(log_output, planned=last_page - 1)
+
+    pending = {asyncio.create_task(fetch(page)): page for page in range(2, last_page + 1)}
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                page = pending.pop(task)
+                products = handle(task.result())
+                # неполная страница последняя, пустая - уже за концом выдачи
+                if products is not None and len(products) < PAGE_SIZE:
+                    last_page = min(last_page, page if products else page - 1)
+            for task, page in list(pending.items()):
+                if page > last_page:
+                    task.cancel()
+                    del pending[task]
+                    report_progress(log_output, planned=-1)
+    finally:
+        # при отмене запуска не оставляем висящих запросов
+        for task in pending:
+            task.cancel()
+    log_output.append(f'Страниц в выдаче: {last_page}')
+    return total, page_sizes
+
+
+async def scrap_price_range(session: aiohttp.ClientSession, limiter: RateLimiter, shard: str, query: str,
+                            low_price: int, top_price: int, discount: int = None, log_output = None,
+                            on_page=None, price_ranges: list = None, checkpoint: Checkpoint = None,
+                            cache: ResponseCache = None, dest: int = DEFAULT_DEST):
+    """сбор диапазона цен: если выдача упирается в 50 страниц, делим диапазон пополам и собираем части параллельно"""
+    can_split = top_price - low_price > 1
+    if price_ranges is not None:
+        price_ranges.append((low_price, top_price))
+    if checkpoint is None or not checkpoint.is_split(low_price, top_price):
+        total, page_sizes = await scrap_pages(
+            session=session,
+            limiter=limiter,
+            shard=shard,
+            query=query,
+            low_price=low_price,
+            top_price=top_price,
+            discount=discount,
+            log_output=log_output,
+            on_page=on_page,
+            stop_if_capped=can_split,
+            checkpoint=checkpoint,
+            cache=cache,
+            dest=dest
+        )
+        if not can_split or not is_capped(total, page_sizes):
+            return
+        if checkpoint is not None:
+            checkpoint.record_split(low_price, top_price)
+    # границы частей совпадают, чтобы не потерять товары с дробной ценой; дубли убираются по id
+    middle = (low_price + top_price) // 2
+    log_output.append(f'Диапазон {low_price}-{top_price} больше {MAX_PAGES} страниц, '
+                      f'делим на {low_price}-{middle} и {middle}-{top_price}')
+    await asyncio.gather(*[
+        scrap_price_range(
+            session=session,
+            limiter=limiter,
+            shard=shard,
+            query=query,
+            low_price=low,
+            top_price=top,
+            discount=discount,
+            log_output=log_output,
+            on_page=on_page,
+            price_ranges=price_ranges,
+            checkpoint=checkpoint,
+            cache=cache,
+            dest=dest
+        ) for low, top in ((low_price, middle), (middle, top_price))
+    ])
+
+
+async def parser(log_output, url: str, low_price: int = 1, top_price: int = 1000000, discount: int = 0, save_path: str = '',
+                 context: CrawlContext = None, export_formats=DEFAULT_FORMATS, delta: bool = False, dests=None,
+                 sort_by_discount: bool = False):
+    """основная функция; dests - регионы через запятую, для нескольких регионов выгружается сводная таблица цен;
+    sort_by_discount - сортировать выгрузку по глубине скидки вместо порядка выдачи вб"""
     start = time.time()  # запишем время старта
-    # получаем данные по заданному каталогу
-    catalog_data = get_data_category(get_catalogs_wb())
+    own_context = context is None
+    if own_context:
+        context = CrawlContext()
+    limiter = context.limiter
+    run_metrics = RunMetrics(url)
+    log_output = MeteredLog(log_output, run_metrics)
+    profiler = None
+    filename = None
+    exports = None
+    history = None
+    checkpoints = {}
+    export_pool = None
+    claimed = set()
+    ok = False
     try:
-        # поиск введенной категории в общем каталоге
-        category = search_category_in_catalog(url=url, catalog_list=catalog_data)
-        data_list = []
-        tasks = []
-        for page in range(1, 51):  # вб отдает 50 страниц товара
-            tasks.append(
-                asyncio.create_task(
-                    scrap_page(
-                        page=page,
-                        shard=category['shard'],
-                        query=category['query'],
-                        low_price=low_price,
-                        top_price=top_price,
-                        discount=discount,
-                        log_output=log_output
-                    )
-                )
-            )
-        result_list = await asyncio.gather(*tasks)
-        for data in result_list:
-            if len(get_data_from_json(data)) > 0:
-                data_list.extend(get_data_from_json(data))
-
-        log_output.append(f'Сбор данных завершен. Собрано: {len(data_list)} товаров.')
+        if context.profile:
+            if PROFILER_LOCK.acquire(blocking=False):
+                profiler = cProfile.Profile()
+                try:
+                    # профилируется весь поток event loop, включая параллельные задачи
+                    profiler.enable()
+                except ValueError:
+                    # python 3.12+: профилировщик уже включен не нами
+                    PROFILER_LOCK.release()
+                    profiler = None
+            if profiler is None:
+                log_output.append('Профилирование пропущено: уже профилируется другой запуск')
+        dests = parse_dests(dests)
+        regional = len(dests) > 1
+        await context.open()
+        cache = context.cache if context.cache_ttl else None
+        # поддиапазоны цен считаются по каждому региону отдельно
+        price_ranges = {dest: [] for dest in dests}
+        # получаем данные по заданному каталогу и ищем введенную категорию
+        with timed(log_output, 'catalog'):
+            await context.catalog.load(context.session)
+        with timed(log_output, 'lookup'):
+            category = context.catalog.find(url)
+        # ключ задачи для истории и отпечатков - раздел, фильтры и первый регион
+        base_key = f'{category["url"]}?priceU={low_price * 100};{top_price * 100}&discount={discount}'
+        task_key = region_key(base_key, dests[0])
+        run_metrics.task = task_key
+        keys = {region_key(base_key, dest) for dest in dests}
+        if keys & context.running_keys:
+            log_output.append('Задача с тем же разделом, фильтрами и регионом уже выполняется, запуск пропущен')
+            return False
+        claimed = keys
+        context.running_keys |= claimed
+        filename = f'{category["name"]}_from_{low_price}_to_{top_price}'
+        if regional and delta:
+            log_output.append('Инкрементальный режим для нескольких регионов не поддерживается, выгружается сводная таблица')
+            delta = False
+        # строки товаров сразу уходят в выгрузку (csv пишется по мере сбора страниц),
+        # для нескольких регионов - в колонки по региону, а выгружается сводная таблица
+        if regional:
+            exports = ExportSink(f'{filename}_regions', save_path, export_formats,
+                                 extra_fields=tuple(region_column(dest) for dest in dests),
+                                 sort_by_discount=sort_by_discount)
+            changes = None
+        elif delta:
+            exports = ExportSink(f'{filename}_delta', save_path, export_formats, extra_fields=(CHANGE_FIELD,),
+                                 sort_by_discount=sort_by_discount)
+            changes = DeltaSink(exports, FingerprintIndex(task_key, context.fingerprints_dir).load())
+        else:
+            exports = ExportSink(filename, save_path, export_formats, sort_by_discount=sort_by_discount)
+            changes = None
+        # pandas загружается в пуле выгрузки, пока идет сбор страниц
+        export_pool = context.get_export_pool() if exports.needs_table(regional) else None
+        # в историю попадает первый регион
+        history = context.store.begin_run(task_key) if context.store is not None else None
+        # контрольная точка: после сбоя собираются только недостающие страницы
+        checkpoints = {dest: Checkpoint(region_key(base_key, dest), context.checkpoints_dir).load() for dest in dests}
+        resumed = sum(len(checkpoint) for checkpoint in checkpoints.values())
+        if resumed:
+            log_output.append(f'Продолжаем прерванный запуск: уже собрано страниц {resumed}')
+        tables = {dest: ProductColumns() for dest in dests} if regional else {}
+        streams = {
+            dest: ProductStream(TeeSink(tables[dest] if regional else changes or exports,
+                                        history if dest == dests[0] else None), log_output)
+            for dest in dests
+        }
+        # регионы собираются параллельно через общий пул соединений и ограничитель запросов
+        crawl_start = time.perf_counter()
+        await asyncio.gather(*[
+            scrap_price_range(
+                session=context.session,
+                limiter=limiter,
+                shard=category['shard'],
+                query=category['query'],
+                low_price=low_price,
+                top_price=top_price,
+                discount=discount,
+                log_output=log_output,
+                on_page=streams[dest].feed,
+                price_ranges=price_ranges[dest],
+                checkpoint=checkpoints[dest],
+                cache=cache,
+                dest=dest
+            ) for dest in dests
+        ])
+
+        if regional:
+            counts = ', '.join(f'{dest}: {stream.count}' for dest, stream in streams.items())
+            log_output.append(f'Сбор данных завершен. Собрано товаров по регионам: {counts}.')
+        else:
+            log_output.append(f'Сбор данных завершен. Собрано: {streams[dests[0]].count} товаров.')
+        # счетчики этого запуска; у ограничителя и пула соединений - общие итоги всех задач контекста
+        log_output.append(run_metrics.connections_summary())
+        log_output.append(f'{run_metrics.requests_summary(time.perf_counter() - crawl_start)}, '
+                          f'параллельность: {limiter.limit}')
+        if regional:
+            counts = ', '.join(f'{dest}: {len(ranges)}' for dest, ranges in price_ranges.items())
+            log_output.append(f'Поддиапазонов цен по регионам: {counts}')
+        else:
+            log_output.append(f'Поддиапазонов цен: {len(price_ranges[dests[0]])}')
+        if cache is not None:
+            log_output.append(run_metrics.cache_summary())
+        # страницы, не полученные после всех повторов: товары с них выглядели бы удаленными
+        failed = run_metrics.counters.get('failed', 0)
         # сохранение найденных данных
-        save_excel(data_list, f'{category["name"]}_from_{low_price}_to_{top_price}', log_output)
+        with timed(log_output, 'export'):
+            if changes is not None and not failed:
+                changes.finish()
+                log_output.append(changes.summary())
+            # таблица собирается и пишется в пуле процессов, сбор других задач тем временем продолжается
+            await exports.close(log_output, export_pool, tables if regional else None)
+        if failed:
+            # отпечатки и история не обновляются, контрольная точка остается для повторного запуска
+            log_output.append(f'Запуск неполный: не получено страниц {failed}. История и отпечатки не обновлены, '
+                              f'при повторном запуске будут собраны только недостающие страницы')
+            return False
+        if changes is not None:
+            changes.index.save()
+        for checkpoint in checkpoints.values():
+            checkpoint.remove()
+        checkpoints = {}
+        if history is not None:
+            history.finish()
+            log_output.append(f'Сохранено в историю: {history.count} товаров, '
+                              f'изменений цены с прошлого запуска: {len(context.store.price_changes(task_key))}')
+            history = None
         log_output.append(f'Ссылка для проверки: {url}?priceU={low_price * 100};{top_price * 100}&discount={discount}')
         end = time.time()  # запишем время завершения кода
         total = end - start  # расчитаем время затраченное на выполнение кода
+        log_output.append(run_metrics.summary())
         log_output.append(f"Затраченное время: {str(round(total, 2))} c")
+        ok = True
+        return True
     except TypeError as e:
         log_output.append(f'Ошибка! Возможно не верно указан раздел. Удалите все доп фильтры и ссылки {e}')
     except PermissionError:
         log_output.append('Ошибка! Вы забыли закрыть созданный ранее excel файл. Закройте и повторите попытку')
+    except (ImportError, ValueError) as e:
+        log_output.append(f'Ошибка выгрузки! {e}')
+    except BrokenProcessPool:
+        # контрольная точка сохраняется, повторный запуск не собирает страницы заново
+        log_output.append('Ошибка выгрузки! Процесс выгрузки аварийно завершился (возможно, не хватило памяти)')
+        context.reset_export_pool(export_pool)
+    finally:
+        if exports is not None:
+            exports.abort()
+        if history is not None:
+            history.abort()
+        for checkpoint in checkpoints.values():
+            checkpoint.save()
+            checkpoint.close()
+        context.running_keys -= claimed
+        if profiler is not None:
+            profiler.disable()
+            PROFILER_LOCK.release()
+        run_metrics.finish(ok)
+        report_metrics(log_output, run_metrics.as_dict())
+        if context.metrics_dir or profiler is not None:
+            path = run_metrics.save(context.metrics_dir or METRICS_DIR, filename or 'run', profiler)
+            log_output.append(f'Метрики запуска сохранены в {path}')
+        if own_context:
+            await context.close()
+    return False
 
 
 async def main():
@@ -175,7 +522,7 @@ async def main():
     discount = 10 # скидка в %
     start = datetime.datetime.now()  # запишем время старта
 
-    await parser(url=url, low_price=low_price, top_price=top_price, discount=discount)
+    await parser(ConsoleLog(), url=url, low_price=low_price, top_price=top_price, discount=discount)
 
     end = datetime.datetime.now()  # запишем время завершения кода
     total = end - start  # расчитаем время затраченное на выполнение кода
@@ -0,0 +1,150 @@
+import datetime
+import random
+import re
+
+JITTER = 0.1  # разброс старта в долях интервала
+MAX_JITTER = 5 * 60  # но не больше, сек.
+INTERVAL_UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+CRON_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+DATE_FORMAT = '%d.%m.%Y %H:%M'
+
+
+class IntervalSchedule:
+    """запуск через равные промежутки: '30m', '2h', '1d'"""
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+
+    def next_run(self, after: datetime.datetime) -> datetime.datetime:
+        return after + datetime.timedelta(seconds=self.seconds)
+
+    def jitter(self) -> float:
+        return min(MAX_JITTER, self.seconds * JITTER)
+
+
+class CronSchedule:
+    """расписание в формате cron: 'минуты часы дни месяцы дни_недели' (*, */n, a-b, a,b)"""
+
+    def __init__(self, fields: list):
+        self.minutes, self.hours, self.days, self.months, weekdays = fields
+        # 7 и 0 - воскресенье
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = len(self.days) == 31
+        self.any_weekday = len(self.weekdays) == 7
+
+    def day_matches(self, moment: datetime.datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        # как в cron: если заданы и дни месяца, и дни недели, достаточно совпадения одного из них
+        return day or weekday
+
+    def next_run(self, after: datetime.datetime) -> datetime.datetime:
+        moment = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = moment + datetime.timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months or not self.day_matches(moment):
+                moment = (moment + datetime.timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + datetime.timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += datetime.timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError('Расписание никогда не срабатывает')
+
+    def jitter(self) -> float:
+        return MAX_JITTER
+
+
+def parse_cron_field(text: str, low: int, high: int) -> set:
+    values = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = map(int, part.split('-'))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f'Неверное поле расписания: {text}')
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_schedule(text: str):
+    """расписание задачи из строки; пустая строка - задача запускается только вручную"""
+    text = (text or '').strip()
+    if not text:
+        return None
+    match = re.fullmatch(r'(\d+)\s*([smhd])', text.lower())
+    if match:
+        seconds = int(match.group(1)) * INTERVAL_UNITS[match.group(2)]
+        if seconds <= 0:
+            raise ValueError(f'Неверное расписание: {text}')
+        return IntervalSchedule(seconds)
+    fields = text.split()
+    if len(fields) != 5:
+        raise ValueError(f'Неверное расписание: {text}')
+    try:
+        schedule = CronSchedule([parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_RANGES)])
+    except ValueError:
+        raise ValueError(f'Неверное расписание: {text}')
+    # например '0 0 31 2 *': поля верные, но такой даты нет
+    try:
+        schedule.next_run(datetime.datetime.now())
+    except ValueError as e:
+        raise ValueError(f'Неверное расписание: {text} ({e})')
+    return schedule
+
+
+class PeriodicScheduler:
+    """выбор задач, которым пора запускаться: разброс времени старта и без наложения запусков"""
+
+    def __init__(self):
+        self.planned = {}  # id задачи -> (строка расписания, время следующего запуска)
+
+    def plan(self, schedule, after: datetime.datetime) -> datetime.datetime:
+        return schedule.next_run(after) + datetime.timedelta(seconds=random.uniform(0, schedule.jitter()))
+
+    def due(self, tasks: list, is_running, now: datetime.datetime = None) -> list:
+        """задачи, которые нужно запустить сейчас; выполняющиеся пропускают свою очередь"""
+        now = now or datetime.datetime.now()
+        due_tasks = []
+        for task in tasks:
+            text = task.get('schedule', '')
+            try:
+                schedule = parse_schedule(text)
+            except ValueError:
+                schedule = None
+            if schedule is None:
+                self.planned.pop(task['id'], None)
+                continue
+            planned_text, next_run = self.planned.get(task['id'], (None, None))
+            try:
+                if planned_text != text:
+                    # новая задача или расписание изменилось: отсчет от последнего успешного запуска
+                    try:
+                        last_run = datetime.datetime.strptime(task.get('last_update', ''), DATE_FORMAT)
+                    except ValueError:
+                        last_run = now
+                    next_run = self.plan(schedule, min(last_run, now))
+                    if next_run <= now:
+                        # запуск пропущен (программа была закрыта): просроченные задачи стартуют вразброс, а не все сразу
+                        next_run = now + datetime.timedelta(seconds=random.uniform(0, schedule.jitter()))
+                if next_run <= now:
+                    if not is_running(task['id']):
+                        due_tasks.append(task)
+                    next_run = self.plan(schedule, now)
+            except ValueError:
+                # расписание перестало срабатывать: пропускаем задачу, остальные планируются как обычно
+                self.planned.pop(task['id'], None)
+                continue
+            self.planned[task['id']] = (text, next_run)
+        return due_tasks
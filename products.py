@@ -0,0 +1,208 @@
+from array import array
+
+from events import report_progress, timed
+
+# колонки итоговой таблицы: поля строки товара и производные колонки, которые считаются при выгрузке
+COLUMNS = [
+    'id',
+    'Наименование',
+    'Цена',
+    'Цена со скидкой',
+    'Скидка',
+    'Бренд',
+    'Рейтинг',
+    'Продавец',
+    'Рейтинг продавца',
+    'Кол-во отзывов',
+    'Рейтинг отзывов',
+    'Промо текст карточки',
+    'Промо текст категории',
+    'Глубина скидки, %',
+    'Ссылка'
+]
+FIELDS = COLUMNS[:-2]
+DERIVED_COLUMNS = COLUMNS[-2:]
+# поля товара в ответе вб, из которых строятся FIELDS
+PRODUCT_KEYS = ('id', 'name', 'priceU', 'salePriceU', 'sale', 'brand', 'rating', 'supplier', 'supplierRating',
+                'feedbacks', 'reviewRating', 'promoTextCard', 'promoTextCat')
+# типы колонок: q - целые, d - числа с пропусками (nan), s - строки
+FIELD_TYPES = 'qsdddsdsdddss'
+# числа с пропусками, которые выгружаются целыми
+INT_FIELDS = ('Цена', 'Цена со скидкой', 'Скидка', 'Кол-во отзывов')
+# тип номеров строк в строковых колонках ProductColumns
+STRING_INDEX = 'i'
+
+
+def product_link(product_id) -> str:
+    return f'https://www.wildberries.ru/catalog/{product_id}/detail.aspx?targetUrl=BP'
+
+
+def discount_depth(price, sale_price):
+    """фактическая скидка от цены до цены со скидкой, %"""
+    if not price or sale_price is None:
+        return None
+    return round((price - sale_price) / price * 100, 1)
+
+
+def derived_values(row: tuple) -> tuple:
+    """производные колонки строки товара в порядке DERIVED_COLUMNS"""
+    return discount_depth(row[2], row[3]), product_link(row[0])
+
+
+def page_products(json_file: dict) -> list:
+    """товары страницы или None, если страницу не удалось получить"""
+    if not json_file or 'data' not in json_file:
+        return None
+    # вб иногда отдает {"data": null} - это пустая страница
+    data = json_file.get('data') or {}
+    return data.get('products') or []
+
+
+def iter_products(json_file: dict):
+    """извлекаем из json строки товаров (кортежи в порядке FIELDS)"""
+    for data in page_products(json_file) or []:
+        yield (
+            data.get('id'),
+            data.get('name'),
+            int(data.get("priceU") / 100),
+            int(data.get('salePriceU') / 100),
+            data.get('sale'),
+            data.get('brand'),
+            data.get('rating'),
+            data.get('supplier'),
+            data.get('supplierRating'),
+            data.get('feedbacks'),
+            data.get('reviewRating'),
+            data.get('promoTextCard'),
+            data.get('promoTextCat')
+        )
+
+
+class ProductColumns:
+    """компактное хранение товаров по колонкам: числа в типизированных массивах,
+    строки - номера в списке различных значений колонки (повторяющиеся бренды и продавцы хранятся один раз)"""
+
+    def __init__(self, extra_fields: tuple = ()):
+        # дополнительные строковые поля идут после FIELDS, производные колонки строятся последними
+        self.fields = FIELDS + list(extra_fields)
+        self.field_types = FIELD_TYPES + 's' * len(extra_fields)
+        self.columns = [array(STRING_INDEX if kind == 's' else kind) for kind in self.field_types]
+        # различные значения строковых колонок и их номера; номер -1 - пропуск
+        self.values = [[] if kind == 's' else None for kind in self.field_types]
+        self._codes = [{} if kind == 's' else None for kind in self.field_types]
+
+    def write(self, row: tuple):
+        for column, kind, values, codes, value in zip(self.columns, self.field_types, self.values, self._codes, row):
+            if kind == 'd':
+                column.append(float('nan') if value is None else value)
+            elif kind != 's':
+                column.append(value)
+            elif value is None:
+                column.append(-1)
+            else:
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(values)
+                    values.append(value)
+                column.append(code)
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def column(self, index: int):
+        """значения колонки; для строковых - сами строки вместо номеров"""
+        values = self.values[index]
+        if values is None:
+            return self.columns[index]
+        # номер -1 (пропуск) указывает на добавленный в конец None
+        values = values + [None]
+        return [values[code] for code in self.columns[index]]
+
+    def rows(self):
+        """строки товаров с производными колонками в порядке колонок"""
+        for row in zip(*map(self.column, range(len(self.fields)))):
+            yield row + derived_values(row)
+
+    def pack(self) -> tuple:
+        """колонки для передачи в другой процесс: числа и номера строк - содержимое массивов,
+        строки - список различных значений колонки (передается через pickle вместе с задачей)"""
+        data = [column.tobytes() if values is None else (values, column.tobytes())
+                for column, values in zip(self.columns, self.values)]
+        return tuple(self.fields[len(FIELDS):]), len(self), data
+
+    @classmethod
+    def unpack(cls, packed: tuple):
+        """колонки из pack()"""
+        extra_fields, count, data = packed
+        products = cls(extra_fields)
+        for index, value in enumerate(data):
+            if products.values[index] is None:
+                products.columns[index].frombytes(value)
+                continue
+            values, encoded = value
+            products.values[index] = list(values)
+            products._codes[index] = {text: code for code, text in enumerate(values)}
+            products.columns[index].frombytes(encoded)
+        return products
+
+    def to_dataframe(self):
+        """DataFrame прямо из колонок, без промежуточных словарей"""
+        import numpy as np
+        import pandas as pd
+
+        data = {}
+        for name, kind, column, values in zip(self.fields, self.field_types, self.columns, self.values):
+            if kind == 'q':
+                data[name] = np.frombuffer(column, dtype=np.int64) if len(column) else np.empty(0, dtype=np.int64)
+            elif kind == 'd':
+                numbers = np.frombuffer(column, dtype=np.float64) if len(column) else np.empty(0)
+                # цены, скидка и отзывы целые, пропуски оставляем пустыми
+                data[name] = pd.array(numbers, dtype='Float64').astype('Int64') if name in INT_FIELDS else numbers
+            else:
+                # номер -1 (пропуск) указывает на последний элемент - None
+                lookup = np.empty(len(values) + 1, dtype=object)
+                lookup[:-1] = values
+                data[name] = lookup[np.frombuffer(column, dtype=np.intc)] if len(column) else np.empty(0, dtype=object)
+        df = pd.DataFrame(data, columns=self.fields, copy=False)
+        price = df['Цена'].astype('Float64')
+        df['Глубина скидки, %'] = ((price - df['Цена со скидкой']) / price.where(price != 0) * 100).round(1)
+        df['Ссылка'] = 'https://www.wildberries.ru/catalog/' + df['id'].astype(str) + '/detail.aspx?targetUrl=BP'
+        return df
+
+
+class TeeSink:
+    """передает каждую строку товара в несколько приемников"""
+
+    def __init__(self, *sinks):
+        self.sinks = [sink for sink in sinks if sink is not None]
+
+    def write(self, row: tuple):
+        for sink in self.sinks:
+            sink.write(row)
+
+
+class ProductStream:
+    """однократный разбор страниц по мере поступления с дедупликацией по id"""
+
+    def __init__(self, sink, log_output=None):
+        self.sink = sink
+        self.log_output = log_output
+        self.seen_ids = set()
+
+    @property
+    def count(self) -> int:
+        return len(self.seen_ids)
+
+    def feed(self, json_file: dict) -> int:
+        """передаем новые товары страницы в приемник, возвращаем их количество"""
+        added = 0
+        with timed(self.log_output, 'extract'):
+            for row in iter_products(json_file):
+                if row[0] in self.seen_ids:
+                    continue
+                self.seen_ids.add(row[0])
+                self.sink.write(row)
+                added += 1
+        if added:
+            report_progress(self.log_output, products=added)
+        return added
@@ -0,0 +1,54 @@
+from products import DERIVED_COLUMNS, FIELDS
+
+DEFAULT_DEST = -1257786  # регион (склад), для которого вб считает цены и наличие; по умолчанию - Москва
+REGION_FIELD = 'Цена со скидкой'  # поле, которое сравнивается между регионами
+
+
+def parse_dests(dests) -> list:
+    """список регионов из строки вида '-1257786, 123589'; пусто - регион по умолчанию"""
+    if isinstance(dests, str):
+        dests = dests.replace(';', ',').split(',')
+    result = []
+    for dest in dests or []:
+        if isinstance(dest, str):
+            dest = dest.strip()
+            if not dest:
+                continue
+        try:
+            dest = int(dest)
+        except ValueError:
+            raise ValueError(f'Неверный регион (dest): {dest}')
+        if dest not in result:
+            result.append(dest)
+    return result or [DEFAULT_DEST]
+
+
+def region_key(task_key: str, dest: int) -> str:
+    """ключ задачи для истории и контрольной точки региона; у региона по умолчанию - прежний"""
+    return task_key if dest == DEFAULT_DEST else f'{task_key}&dest={dest}'
+
+
+def region_column(dest: int) -> str:
+    return f'{REGION_FIELD} ({dest})'
+
+
+def merge_regions(tables: dict):
+    """сводная таблица по регионам {dest: ProductColumns}: одна строка на товар, цена каждого региона - в своей колонке.
+    Остальные поля берутся из первого региона, где товар найден"""
+    import pandas as pd
+
+    frames = []
+    for dest, products in tables.items():
+        frame = products.to_dataframe()
+        frame['dest'] = dest
+        frames.append(frame)
+    data = pd.concat(frames, ignore_index=True)
+    prices = data.pivot(index='id', columns='dest', values=REGION_FIELD).reindex(columns=list(tables))
+    # регион без товара дает колонку из пропусков - приводим все цены к целым с пропусками
+    prices = prices.astype('Int64')
+    prices.columns = [region_column(dest) for dest in prices.columns]
+    base = data.drop_duplicates('id').set_index('id')
+    merged = base[FIELDS[1:]].join(prices)
+    for column in DERIVED_COLUMNS:
+        merged[column] = base[column]
+    return merged.reset_index()
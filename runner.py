@@ -0,0 +1,101 @@
+import asyncio
+import concurrent.futures
+import threading
+
+from events import EventChannel
+from parser import CrawlContext, parser
+
+STOP_TIMEOUT = 30  # сколько ждать завершения отмененных задач при остановке, сек.
+
+
+class TaskRunner:
+    """долгоживущий event loop в отдельном потоке: задачи выполняются параллельно
+    с общим пулом соединений, каталогом и ограничителем запросов"""
+
+    def __init__(self, context: CrawlContext = None):
+        self.context = context
+        # id задачи -> asyncio.Task; None - задача принята, но еще не создана в loop
+        self.running = {}
+        self._lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name='parser-loop', daemon=True)
+        self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _run(self, log_output, kwargs: dict) -> bool:
+        if self.context is None:
+            self.context = CrawlContext()
+        return await parser(log_output, context=self.context, **kwargs)
+
+    def submit(self, task_id, name: str, channel: EventChannel, on_done=None, **kwargs) -> bool:
+        """запуск задачи; задача считается выполняющейся, пока полностью не завершится (в том числе после отмены),
+        поэтому повторно она не запускается, пока старый запуск еще пишет свои файлы"""
+        task_channel = channel.for_task(task_id, name)
+        with self._lock:
+            if task_id in self.running:
+                return False
+            self.running[task_id] = None
+
+        def done(task: asyncio.Task):
+            # вызывается в потоке loop, когда корутина уже выполнила все finally
+            with self._lock:
+                self.running.pop(task_id, None)
+            if task.cancelled():
+                task_channel.finished('cancelled')
+            elif task.exception() is not None:
+                task_channel.append(f'Ошибка! {task.exception()!r}')
+                task_channel.finished('error', str(task.exception()))
+            else:
+                task_channel.finished('ok' if task.result() else 'error')
+            if on_done is not None:
+                on_done(task_id, task)
+
+        def start():
+            task = self.loop.create_task(self._run(task_channel, kwargs))
+            with self._lock:
+                self.running[task_id] = task
+            task.add_done_callback(done)
+
+        self.loop.call_soon_threadsafe(start)
+        return True
+
+    def is_running(self, task_id) -> bool:
+        with self._lock:
+            return task_id in self.running
+
+    def cancel(self, task_id) -> bool:
+        """запрос отмены; о завершении задача сообщит статусом 'cancelled'"""
+        with self._lock:
+            if task_id not in self.running:
+                return False
+        # выполнится в loop после start() этой задачи: вызовы call_soon_threadsafe идут по порядку
+        self.loop.call_soon_threadsafe(self._cancel, task_id)
+        return True
+
+    def _cancel(self, task_id):
+        with self._lock:
+            task = self.running.get(task_id)
+        if task is not None:
+            task.cancel()
+
+    async def _shutdown(self):
+        with self._lock:
+            tasks = [task for task in self.running.values() if task is not None]
+        for task in tasks:
+            task.cancel()
+        # контекст закрывается только после того, как задачи отработали свои finally
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.context is not None:
+            await self.context.close()
+
+    def stop(self, timeout: float = STOP_TIMEOUT):
+        """отмена всех задач, закрытие соединений и остановка loop"""
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
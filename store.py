@@ -0,0 +1,154 @@
+import datetime
+import sqlite3
+import threading
+
+STORE_PATH = 'results.db'
+BATCH_SIZE = 2000  # строк в одной пачке вставки
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    products INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_task ON runs (task, run_id);
+CREATE TABLE IF NOT EXISTS products (
+    run_id INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT,
+    price INTEGER,
+    sale_price INTEGER,
+    sale INTEGER,
+    brand TEXT,
+    rating REAL,
+    supplier TEXT,
+    supplier_rating REAL,
+    feedbacks INTEGER,
+    review_rating REAL,
+    promo_card TEXT,
+    promo_cat TEXT,
+    PRIMARY KEY (run_id, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS products_id ON products (id, run_id);
+CREATE INDEX IF NOT EXISTS products_brand ON products (brand);
+CREATE INDEX IF NOT EXISTS products_supplier ON products (supplier);
+CREATE INDEX IF NOT EXISTS products_price ON products (sale_price);
+"""
+INSERT_PRODUCT = 'INSERT OR IGNORE INTO products VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+
+
+class RunWriter:
+    """приемник строк товаров одного запуска: вставка в базу пачками"""
+
+    def __init__(self, store, run_id: int):
+        self.store = store
+        self.run_id = run_id
+        self.batch = []
+        self.count = 0
+
+    def write(self, row: tuple):
+        self.batch.append((self.run_id,) + row)
+        if len(self.batch) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.store.execute_many(INSERT_PRODUCT, self.batch)
+            self.count += len(self.batch)
+            self.batch = []
+
+    def finish(self):
+        """запуск завершен: он становится виден в запросах истории"""
+        self.flush()
+        self.store.execute(
+            'UPDATE runs SET finished_at = ?, products = ? WHERE run_id = ?',
+            (datetime.datetime.now().isoformat(timespec='seconds'), self.count, self.run_id)
+        )
+
+    def abort(self):
+        """неудачный запуск не попадает в историю"""
+        self.batch = []
+        self.store.execute('DELETE FROM products WHERE run_id = ?', (self.run_id,))
+        self.store.execute('DELETE FROM runs WHERE run_id = ?', (self.run_id,))
+
+
+class ResultStore:
+    """история запусков задач в sqlite (WAL): товары каждого запуска с ценами"""
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock, self.connection:
+            return self.connection.execute(sql, params).fetchall()
+
+    def execute_many(self, sql: str, rows: list):
+        with self._lock, self.connection:
+            self.connection.executemany(sql, rows)
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+    def begin_run(self, task: str) -> RunWriter:
+        with self._lock, self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO runs (task, started_at) VALUES (?, ?)',
+                (task, datetime.datetime.now().isoformat(timespec='seconds'))
+            )
+        return RunWriter(self, cursor.lastrowid)
+
+    def last_runs(self, task: str, limit: int = 2) -> list:
+        """id последних завершенных запусков задачи, от новых к старым"""
+        rows = self.execute(
+            'SELECT run_id FROM runs WHERE task = ? AND finished_at IS NOT NULL ORDER BY run_id DESC LIMIT ?',
+            (task, limit)
+        )
+        return [row[0] for row in rows]
+
+    def _compared_runs(self, task: str, run_id: int, prev_run_id: int) -> tuple:
+        if run_id is None or prev_run_id is None:
+            runs = self.last_runs(task)
+            if len(runs) < 2:
+                return None, None
+            run_id, prev_run_id = runs
+        return run_id, prev_run_id
+
+    def price_changes(self, task: str, run_id: int = None, prev_run_id: int = None) -> list:
+        """товары, у которых изменилась цена со скидкой: (id, название, была, стала, разница)"""
+        run_id, prev_run_id = self._compared_runs(task, run_id, prev_run_id)
+        if run_id is None:
+            return []
+        return self.execute(
+            'SELECT cur.id, cur.name, prev.sale_price, cur.sale_price, cur.sale_price - prev.sale_price '
+            'FROM products cur JOIN products prev ON prev.run_id = ? AND prev.id = cur.id '
+            'WHERE cur.run_id = ? AND cur.sale_price != prev.sale_price '
+            'ORDER BY cur.sale_price - prev.sale_price',
+            (prev_run_id, run_id)
+        )
+
+    def new_products(self, task: str, run_id: int = None, prev_run_id: int = None) -> list:
+        """товары, которых не было в предыдущем запуске: (id, название, цена со скидкой)"""
+        run_id, prev_run_id = self._compared_runs(task, run_id, prev_run_id)
+        if run_id is None:
+            return []
+        return self.execute(
+            'SELECT cur.id, cur.name, cur.sale_price FROM products cur '
+            'WHERE cur.run_id = ? AND NOT EXISTS '
+            '(SELECT 1 FROM products prev WHERE prev.run_id = ? AND prev.id = cur.id)',
+            (run_id, prev_run_id)
+        )
+
+    def disappeared_products(self, task: str, run_id: int = None, prev_run_id: int = None) -> list:
+        """товары из предыдущего запуска, которых больше нет в выдаче"""
+        run_id, prev_run_id = self._compared_runs(task, run_id, prev_run_id)
+        if run_id is None:
+            return []
+        return self.new_products(task, prev_run_id, run_id)
@@ -1,6 +1,8 @@
-import datetime
+from PyQt5.QtWidgets import QDialog, QLineEdit, QPushButton, QFormLayout, QCheckBox
 
-from PyQt5.QtWidgets import QDialog, QLineEdit, QPushButton, QFormLayout
+from exporters import DEFAULT_FORMATS, parse_formats
+from periodic import parse_schedule
+from regions import parse_dests
 
 
 class TaskDialog(QDialog):
@@ -17,6 +19,13 @@ class TaskDialog(QDialog):
         self.low_price_input = QLineEdit(str(self.task_data["low_price"]))
         self.top_price_input = QLineEdit(str(self.task_data["top_price"]))
         self.discount_input = QLineEdit(str(self.task_data["discount"]))
+        self.export_formats_input = QLineEdit(self.task_data.get("export_formats", DEFAULT_FORMATS))
+        self.delta_input = QCheckBox("выгружать только изменения с прошлого запуска")
+        self.delta_input.setChecked(self.task_data.get("delta", False))
+        self.sort_input = QCheckBox("сначала самые глубокие скидки (csv - в порядке сбора)")
+        self.sort_input.setChecked(self.task_data.get("sort_by_discount", False))
+        self.schedule_input = QLineEdit(self.task_data.get("schedule", ""))
+        self.dests_input = QLineEdit(self.task_data.get("dests", ""))
 
         save_button = QPushButton("Сохранить")
 
@@ -27,6 +36,11 @@ class TaskDialog(QDialog):
         form_layout.addRow("Мин. цена:", self.low_price_input)
         form_layout.addRow("Макс. цена:", self.top_price_input)
         form_layout.addRow("Мин. скидка:", self.discount_input)
+        form_layout.addRow("Форматы выгрузки (xlsx, csv, parquet, feather):", self.export_formats_input)
+        form_layout.addRow("Инкрементальный режим:", self.delta_input)
+        form_layout.addRow("Сортировка выгрузки:", self.sort_input)
+        form_layout.addRow("Расписание (30m, 2h, 1d или cron '0 9 * * *'):", self.schedule_input)
+        form_layout.addRow("Регионы (dest через запятую, пусто - Москва):", self.dests_input)
         form_layout.addRow(save_button)
         self.setLayout(form_layout)
         save_button.clicked.connect(self.save_changes)
@@ -40,12 +54,17 @@ class TaskDialog(QDialog):
             self.task_data["low_price"] = int(self.low_price_input.text())
             self.task_data["top_price"] = int(self.top_price_input.text())
             self.task_data["discount"] = int(self.discount_input.text())
-            if not 'last_update' in self.task_data:
-                self.task_data["last_update"] = datetime.datetime.now().strftime('%d.%m.%Y %H:%M')
+            self.task_data["export_formats"] = ', '.join(parse_formats(self.export_formats_input.text()))
+            self.task_data["delta"] = self.delta_input.isChecked()
+            self.task_data["sort_by_discount"] = self.sort_input.isChecked()
+            parse_schedule(self.schedule_input.text())
+            self.task_data["schedule"] = self.schedule_input.text().strip()
+            parse_dests(self.dests_input.text())
+            self.task_data["dests"] = self.dests_input.text().strip()
             self.accept()
         except Exception as e:
             print(e)
 
     def get_task_data(self):
         # Возвращаем обновленные данные задачи
-        return self.task_data
\ No newline at end of file
+        return self.task_data
\ No newline at end of file
@@ -0,0 +1,150 @@
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionProgressBar
+
+from events import PROGRESS_FIELDS
+from manager import TaskRegistry
+from metrics import STAGES
+
+HEADERS = ['id', "Название", "Ссылка", "Мин. цена", "Макс. цена", "Мин. скидка", "Последнее обновление", "Прогресс"]
+TASK_KEYS = ['id', 'name', 'link', 'low_price', 'top_price', 'discount', 'last_update']
+PROGRESS_COLUMN = len(HEADERS) - 1
+FINISHED_STATUSES = {'ok': 'готово', 'error': 'ошибка', 'cancelled': 'остановлено'}
+# данные для сортировки (числа как числа) и для отрисовки прогресса
+SORT_ROLE = Qt.UserRole
+PROGRESS_ROLE = Qt.UserRole + 1
+
+
+class TaskTableModel(QAbstractTableModel):
+    """таблица задач поверх TaskRegistry: при изменении перерисовываются только затронутые строки"""
+
+    def __init__(self, registry: TaskRegistry, parent=None):
+        super().__init__(parent)
+        self.registry = registry
+        self.progress = {}  # id задачи -> накопленные счетчики прогресса
+        self.metrics = {}  # id задачи -> метрики последнего запуска
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.registry)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return HEADERS[section]
+        return None
+
+    def flags(self, index):
+        # задачи меняются только через диалог
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        task = self.registry.tasks[index.row()]
+        column = index.column()
+        if column == PROGRESS_COLUMN:
+            progress = self.progress.get(task['id'])
+            if role == PROGRESS_ROLE:
+                return progress
+            if role in (Qt.DisplayRole, SORT_ROLE):
+                return progress_text(progress) if progress else ''
+            if role == Qt.ToolTipRole:
+                return metrics_tooltip(self.metrics.get(task['id']))
+            return None
+        value = task.get(TASK_KEYS[column], '')
+        if role == Qt.DisplayRole:
+            return str(value)
+        if role == SORT_ROLE:
+            return value
+        if role == Qt.ToolTipRole and TASK_KEYS[column] == 'last_update':
+            return f"Длительность последнего запуска: {task.get('last_duration', '-')} c\n" \
+                   f"Расписание: {task.get('schedule') or 'вручную'}"
+        return None
+
+    def task_id(self, row: int):
+        return self.registry.tasks[row]['id']
+
+    def add_task(self, task: dict):
+        row = len(self.registry)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.registry.add(task)
+        self.endInsertRows()
+
+    def remove_task(self, task_id):
+        row = self.registry.row(task_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.registry.remove(task_id)
+        self.endRemoveRows()
+        self.progress.pop(task_id, None)
+        self.metrics.pop(task_id, None)
+
+    def task_changed(self, task_id, save: bool = True):
+        """задача изменена на месте: сохраняем и перерисовываем ее строку"""
+        if save:
+            self.registry.save()
+        self.row_changed(task_id, 0, PROGRESS_COLUMN)
+
+    def reset_progress(self, task_id):
+        self.progress[task_id] = dict.fromkeys(PROGRESS_FIELDS, 0)
+        self.row_changed(task_id, PROGRESS_COLUMN, PROGRESS_COLUMN)
+
+    def add_progress(self, task_id, counters: dict = None, status: str = None, metrics: dict = None):
+        totals = self.progress.setdefault(task_id, dict.fromkeys(PROGRESS_FIELDS, 0))
+        for key, value in (counters or {}).items():
+            totals[key] = totals.get(key, 0) + value
+        if status is not None:
+            totals['status'] = status
+        if metrics is not None:
+            self.metrics[task_id] = metrics
+        self.row_changed(task_id, PROGRESS_COLUMN, PROGRESS_COLUMN)
+
+    def row_changed(self, task_id, first: int, last: int):
+        row = self.registry.row(task_id)
+        if row is not None:
+            self.dataChanged.emit(self.index(row, first), self.index(row, last))
+
+
+def progress_text(progress: dict) -> str:
+    text = f"{progress['pages']}/{progress['planned']} стр., {progress['products']} тов."
+    if progress['retries']:
+        text += f", повторов: {progress['retries']}"
+    if progress.get('failed'):
+        text += f", не получено: {progress['failed']}"
+    if progress.get('status'):
+        text += f" - {FINISHED_STATUSES[progress['status']]}"
+    return text
+
+
+def metrics_tooltip(metrics: dict) -> str:
+    """разбивка последнего запуска задачи по этапам"""
+    if metrics is None:
+        return ''
+    lines = [f"Последний запуск: {metrics['seconds']} c"]
+    for stage, span in metrics['stages'].items():
+        lines.append(f"{STAGES.get(stage, stage)}: {span['seconds']} c ({span['count']}, макс. {span['max']} c)")
+    if metrics['counters'].get('bytes'):
+        lines.append(f"Загружено: {round(metrics['counters']['bytes'] / 2 ** 20, 1)} МБ")
+    return '\n'.join(lines)
+
+
+class ProgressDelegate(QStyledItemDelegate):
+    """прогресс задачи рисуется полосой прямо в ячейке, без виджета на каждую строку"""
+
+    def paint(self, painter, option, index):
+        progress = index.data(PROGRESS_ROLE)
+        if progress is None:
+            return super().paint(painter, option, index)
+        bar = QStyleOptionProgressBar()
+        bar.rect = option.rect.adjusted(2, 2, -2, -2)
+        bar.state = option.state | QStyle.State_Enabled
+        bar.minimum = 0
+        bar.maximum = max(progress['planned'], 1)
+        bar.progress = min(progress['pages'], bar.maximum)
+        bar.text = progress_text(progress)
+        bar.textVisible = True
+        bar.textAlignment = Qt.AlignCenter
+        style = option.widget.style() if option.widget is not None else QApplication.style()
+        style.drawControl(QStyle.CE_ProgressBar, bar, painter)
@@ -0,0 +1,99 @@
+import asyncio
+import os
+
+import checkpoint
+import parser as wb_parser
+from benchmarks.fake_wb import CATEGORY_URL, FakeWB
+from catalog import CatalogCache
+from checkpoint import Checkpoint
+from throttle import RateLimiter
+
+
+def page(*ids, total=None) -> dict:
+    data = {'products': [{'id': product_id, 'name': f'Товар {product_id}', 'priceU': 10000, 'extra': 'x'}
+                         for product_id in ids]}
+    if total is not None:
+        data['total'] = total
+    return {'data': data}
+
+
+def test_resume_after_interruption(tmp_path):
+    first = Checkpoint('task', str(tmp_path))
+    first.record(1, 1000, 1, page(1, 2, total=250))
+    first.record(1, 1000, 2, page(3))
+    first.record_split(1, 100000)
+    first.save()
+    first.close()
+
+    resumed = Checkpoint('task', str(tmp_path)).load()
+    assert len(resumed) == 2
+    data = resumed.get(1, 1000, 1)
+    assert data['data']['total'] == 250
+    assert [product['id'] for product in data['data']['products']] == [1, 2]
+    # в файл попадают только поля для выгрузки
+    assert 'extra' not in data['data']['products'][0]
+    assert resumed.get(1, 1000, 3) is None
+    assert resumed.get(1, 500, 1) is None
+    assert resumed.is_split(1, 100000) and not resumed.is_split(1, 1000)
+    assert resumed.started == first.started
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    first = Checkpoint('task', str(tmp_path))
+    first.record(1, 1000, 1, page(1))
+    first.record(1, 1000, 2, page(2))
+    first.save()
+    first.close()
+    # последняя строка товаров оборвана при сбое
+    with open(first.spill_path, 'r+b') as file:
+        file.truncate(os.path.getsize(first.spill_path) - 5)
+
+    resumed = Checkpoint('task', str(tmp_path)).load()
+    assert len(resumed) == 1
+    assert resumed.get(1, 1000, 2) is None
+
+
+def test_expired_checkpoint_is_removed(tmp_path, monkeypatch):
+    first = Checkpoint('task', str(tmp_path))
+    first.record(1, 1000, 1, page(1))
+    first.save()
+    first.close()
+
+    monkeypatch.setattr(checkpoint, 'CHECKPOINT_TTL', -1)
+    resumed = Checkpoint('task', str(tmp_path)).load()
+    assert len(resumed) == 0
+    assert not os.path.exists(first.path) and not os.path.exists(first.spill_path)
+
+
+def test_remove_after_success(tmp_path):
+    first = Checkpoint('task', str(tmp_path))
+    first.record(1, 1000, 1, page(1))
+    first.save()
+    first.remove()
+    assert os.listdir(tmp_path) == []
+    assert len(Checkpoint('task', str(tmp_path)).load()) == 0
+
+
+def test_same_task_does_not_run_twice(tmp_path, monkeypatch):
+    monkeypatch.setattr(wb_parser, 'CATALOG_API', wb_parser.CATALOG_API)
+
+    async def run_both() -> tuple:
+        async with FakeWB(products=1000) as server:
+            wb_parser.CATALOG_API = server.catalog_api
+            context = wb_parser.CrawlContext(
+                limiter=RateLimiter(rate=1000, burst=1000),
+                catalog=CatalogCache(path=str(tmp_path / 'catalog.json'), url=server.menu_url),
+                store_path=None, export_workers=0, checkpoints_dir=str(tmp_path / 'checkpoints'))
+            logs = [], []
+            try:
+                results = await asyncio.gather(*[
+                    wb_parser.parser(log, CATEGORY_URL, save_path=str(tmp_path), context=context, export_formats='csv')
+                    for log in logs])
+            finally:
+                await context.close()
+            return results, logs, context.running_keys
+
+    (first, second), (_, log), running = asyncio.run(run_both())
+    assert first and not second
+    assert any('уже выполняется' in str(line) for line in log)
+    assert running == set()
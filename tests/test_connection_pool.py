@@ -0,0 +1,52 @@
+import asyncio
+
+import aiohttp
+
+import parser as wb_parser
+from benchmarks.fake_wb import FakeWB
+from parser import CONNECTION_LIMIT_PER_HOST, ConnectionStats, CrawlContext, create_session, scrap_page
+from throttle import RateLimiter
+
+PAGES = 50
+
+
+async def fetch_pages(make_session) -> int:
+    """50 параллельных страниц; возвращает число открытых соединений"""
+    stats = ConnectionStats()
+    limiter = RateLimiter(rate=1000, burst=PAGES, concurrency=PAGES, max_concurrency=PAGES)
+    async with FakeWB(products=PAGES * 100, latency=0.05) as server:
+        wb_parser.CATALOG_API = server.catalog_api
+        shared = make_session(stats)
+
+        async def fetch(page: int) -> dict:
+            session = shared or aiohttp.ClientSession(trace_configs=[stats.trace_config()])
+            try:
+                return await scrap_page(session, limiter, page, 'benchmark', 'cat=1', 1, 1000000, log_output=[])
+            finally:
+                if shared is None:
+                    await session.close()
+
+        try:
+            pages = await asyncio.gather(*[fetch(page) for page in range(1, PAGES + 1)])
+        finally:
+            if shared is not None:
+                await shared.close()
+    assert all(page['data']['products'] for page in pages)
+    return stats.handshakes
+
+
+def test_shared_session_reuses_connections(monkeypatch):
+    # fetch_pages направляет парсер на заглушку; после теста адрес вб восстанавливается
+    monkeypatch.setattr(wb_parser, 'CATALOG_API', wb_parser.CATALOG_API)
+    # прежнее поведение: своя сессия на каждую страницу - соединение на каждый запрос
+    assert asyncio.run(fetch_pages(lambda stats: None)) == PAGES
+    # общая сессия: соединений не больше размера пула
+    assert asyncio.run(fetch_pages(create_session)) <= CONNECTION_LIMIT_PER_HOST
+
+
+def test_context_pool_fits_limiter():
+    async def limit_per_host() -> int:
+        async with CrawlContext(limiter=RateLimiter(max_concurrency=25), store_path=None) as context:
+            return context.session.connector.limit_per_host
+
+    assert asyncio.run(limit_per_host()) == 25
@@ -0,0 +1,63 @@
+from delta import ADDED, CHANGED, REMOVED, DeltaSink, FingerprintIndex
+from products import FIELDS
+
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, row: tuple):
+        self.rows.append(row)
+
+
+def product(product_id: int, price: int = 100, name: str = 'Товар') -> tuple:
+    row = [None] * len(FIELDS)
+    row[:5] = [product_id, name, price, price - 10, 10]
+    return tuple(row)
+
+
+def run(index: FingerprintIndex, rows: list) -> tuple:
+    sink = ListSink()
+    changes = DeltaSink(sink, index)
+    for row in rows:
+        changes.write(row)
+    changes.finish()
+    return sink.rows, changes.counts
+
+
+def test_first_run_adds_everything(tmp_path):
+    rows, counts = run(FingerprintIndex('task', str(tmp_path)), [product(1), product(2)])
+    assert [row[-1] for row in rows] == [ADDED, ADDED]
+    assert counts == {ADDED: 2, CHANGED: 0, REMOVED: 0}
+
+
+def test_changes_since_saved_run(tmp_path):
+    index = FingerprintIndex('task', str(tmp_path))
+    run(index, [product(1), product(2), product(3)])
+    index.save()
+
+    index = FingerprintIndex('task', str(tmp_path)).load()
+    rows, counts = run(index, [product(1), product(2, price=200), product(4)])
+    assert counts == {ADDED: 1, CHANGED: 1, REMOVED: 1}
+    by_id = {row[0]: row for row in rows}
+    assert by_id[2][-1] == CHANGED and by_id[2][2] == 200
+    assert by_id[4][-1] == ADDED
+    # от удаленного товара известен только id
+    assert by_id[3] == (3,) + (None,) * (len(FIELDS) - 1) + (REMOVED,)
+    assert 1 not in by_id
+    assert set(index.fingerprints) == {1, 2, 4}
+
+
+def test_untracked_field_is_not_a_change(tmp_path):
+    index = FingerprintIndex('task', str(tmp_path))
+    run(index, [product(1)])
+    rows, counts = run(index, [product(1, name='Новое название')])
+    assert rows == [] and counts == {ADDED: 0, CHANGED: 0, REMOVED: 0}
+
+
+def test_index_is_per_task(tmp_path):
+    index = FingerprintIndex('task', str(tmp_path))
+    run(index, [product(1)])
+    index.save()
+    assert FingerprintIndex('other', str(tmp_path)).load().fingerprints == {}
+    assert FingerprintIndex('task', str(tmp_path)).load().fingerprints == index.fingerprints
@@ -0,0 +1,58 @@
+import asyncio
+import os
+
+from exporters import ExportSink
+from products import FIELDS, ProductColumns
+from regions import region_column
+
+
+def product(product_id: int) -> tuple:
+    row = [None] * len(FIELDS)
+    row[:5] = [product_id, 'Товар', 1000, 800, 20]
+    return tuple(row)
+
+
+def read(path: str) -> list:
+    with open(path, encoding='utf-8-sig') as file:
+        return file.read().splitlines()
+
+
+def test_csv_replaced_only_after_close(tmp_path):
+    path = tmp_path / 'товары.csv'
+    path.write_text('прошлый запуск', encoding='utf-8-sig')
+    sink = ExportSink('товары', str(tmp_path), 'csv')
+    sink.write(product(1))
+    assert read(path) == ['прошлый запуск']
+    asyncio.run(sink.close([]))
+    assert len(read(path)) == 2 and read(path)[1].startswith('1;')
+    assert os.listdir(tmp_path) == ['товары.csv']
+
+
+def test_aborted_run_keeps_previous_csv(tmp_path):
+    path = tmp_path / 'товары.csv'
+    path.write_text('прошлый запуск', encoding='utf-8-sig')
+    sink = ExportSink('товары', str(tmp_path), 'csv')
+    sink.write(product(1))
+    sink.abort()
+    assert read(path) == ['прошлый запуск']
+    assert os.listdir(tmp_path) == ['товары.csv']
+
+
+def test_regional_csv_written_whole(tmp_path):
+    tables = {}
+    for dest in (1, 2):
+        tables[dest] = ProductColumns()
+        tables[dest].write(product(dest))
+    sink = ExportSink('товары', str(tmp_path), 'csv', extra_fields=tuple(map(region_column, tables)))
+    asyncio.run(sink.close([], tables=tables))
+    assert len(read(tmp_path / 'товары.csv')) == 3
+    assert os.listdir(tmp_path) == ['товары.csv']
+
+
+def test_only_whole_tables_need_export_pool(tmp_path):
+    csv_only = ExportSink('товары', str(tmp_path), 'csv')
+    assert not csv_only.needs_table() and csv_only.needs_table(regional=True)
+    csv_only.abort()
+    with_excel = ExportSink('товары', str(tmp_path), 'csv,xlsx')
+    assert with_excel.needs_table()
+    with_excel.abort()
@@ -0,0 +1,57 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import http_cache
+from http_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(http_cache, 'time', SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def test_hit_and_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), ttl=60)
+    assert cache.get('url') is None
+    cache.put('url', b'{"data": {}}')
+    clock.value += 59
+    assert cache.get('url') == b'{"data": {}}'
+    clock.value += 2
+    assert cache.get('url') is None
+    # устаревший ответ удаляется
+    assert cache.total_bytes == 0
+    cache.close()
+
+
+def test_lru_eviction(tmp_path, clock):
+    bodies = {name: os.urandom(1000) for name in 'abcd'}
+    cache = ResponseCache(str(tmp_path / 'cache.db'), ttl=3600, max_bytes=3500)
+    for name in 'abc':
+        cache.put(name, bodies[name])
+        clock.value += 1
+    # 'a' читали недавно, самым старым становится 'b'
+    assert cache.get('a') == bodies['a']
+    clock.value += 1
+    cache.put('d', bodies['d'])
+    assert cache.total_bytes <= 3500 * 0.9
+    assert cache.get('b') is None
+    for name in 'acd':
+        assert cache.get(name) == bodies[name]
+    cache.close()
+
+
+def test_size_survives_reopen(tmp_path, clock):
+    path = str(tmp_path / 'cache.db')
+    cache = ResponseCache(path, ttl=60)
+    cache.put('url', b'x' * 10000)
+    cache.put('url', b'y' * 100)
+    size = cache.total_bytes
+    cache.close()
+    reopened = ResponseCache(path, ttl=60)
+    assert reopened.total_bytes == size
+    assert reopened.get('url') == b'y' * 100
+    reopened.close()
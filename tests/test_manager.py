@@ -0,0 +1,42 @@
+import json
+import threading
+
+from manager import CRUDManager
+
+
+def read(path) -> list:
+    with open(path) as file:
+        return json.load(file)
+
+
+def test_delayed_write_keeps_snapshot(tmp_path):
+    path = tmp_path / 'tasks.json'
+    crud = CRUDManager(str(path), [], write_delay=60)
+    tasks = [{'id': 1, 'name': 'Задача'}]
+    crud.update(tasks)
+    # изменения после update() попадут в файл только со следующим update()
+    tasks[0]['name'] = 'Изменена'
+    tasks.append({'id': 2})
+    assert read(path) == []
+    crud.flush()
+    assert read(path) == [{'id': 1, 'name': 'Задача'}]
+    crud.update(tasks)
+    crud.flush()
+    assert read(path) == [{'id': 1, 'name': 'Изменена'}, {'id': 2}]
+
+
+def test_timer_writes_batched_changes(tmp_path):
+    path = tmp_path / 'tasks.json'
+    crud = CRUDManager(str(path), [], write_delay=0.05)
+    written = threading.Event()
+    write_text = crud._write_text
+
+    def on_write(text):
+        write_text(text)
+        written.set()
+
+    crud._write_text = on_write
+    for count in range(1, 4):
+        crud.update([{'id': task_id} for task_id in range(count)])
+    assert written.wait(5)
+    assert len(read(path)) == 3
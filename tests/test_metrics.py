@@ -0,0 +1,35 @@
+import asyncio
+
+import parser as wb_parser
+from benchmarks.fake_wb import CATEGORY_URL, FakeWB
+from catalog import CatalogCache
+from throttle import RateLimiter
+
+
+def test_one_profiler_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(wb_parser, 'CATALOG_API', wb_parser.CATALOG_API)
+
+    async def run_both() -> list:
+        async with FakeWB(products=1000) as server:
+            wb_parser.CATALOG_API = server.catalog_api
+            context = wb_parser.CrawlContext(
+                limiter=RateLimiter(rate=1000, burst=1000),
+                catalog=CatalogCache(path=str(tmp_path / 'catalog.json'), url=server.menu_url),
+                store_path=None, export_workers=0, metrics_dir=str(tmp_path / 'metrics'), profile=True,
+                checkpoints_dir=str(tmp_path / 'checkpoints'))
+            logs = [], []
+            try:
+                results = await asyncio.gather(*[
+                    wb_parser.parser(log, CATEGORY_URL, top_price=top_price, save_path=str(tmp_path),
+                                     context=context, export_formats='csv')
+                    for log, top_price in zip(logs, (500, 1000))])
+            finally:
+                await context.close()
+            assert all(results)
+            return logs
+
+    logs = asyncio.run(run_both())
+    skipped = [any('Профилирование пропущено' in str(line) for line in log) for log in logs]
+    assert sorted(skipped) == [False, True]
+    assert not wb_parser.PROFILER_LOCK.locked()
+    assert len(list((tmp_path / 'metrics').glob('*.prof'))) == 1
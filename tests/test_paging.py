@@ -0,0 +1,110 @@
+import asyncio
+import math
+
+import pytest
+
+import parser as wb_parser
+from benchmarks.fake_wb import SHARD, FakeWB
+from parser import MAX_PAGES, PAGE_SIZE, create_session, is_capped, scrap_pages, scrap_price_range
+from products import ProductStream
+from throttle import RateLimiter
+
+QUERY = 'subject=1'
+TOP_PRICE = 1000000
+
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, row: tuple):
+        self.rows.append(row)
+
+
+def catalog_ids(server: FakeWB, low_price: int = 1, top_price: int = TOP_PRICE) -> set:
+    return {product['id'] for product in server.products if low_price * 100 <= product['priceU'] <= top_price * 100}
+
+
+def crawl(products: int, with_total: bool, concurrency: int = 10, range_crawl: bool = False) -> tuple:
+    """сбор через заглушку вб: (сервер, id всех полученных товаров по порядку, поток товаров, диапазоны цен)"""
+    async def run():
+        async with FakeWB(products=products, latency=0.001, with_total=with_total) as server:
+            wb_parser.CATALOG_API = server.catalog_api
+            limiter = RateLimiter(rate=100000, burst=100000, concurrency=concurrency, max_concurrency=concurrency)
+            ids = []
+            stream = ProductStream(ListSink(), [])
+            price_ranges = []
+
+            def on_page(data: dict):
+                ids.extend(product['id'] for product in data['data']['products'])
+                stream.feed(data)
+
+            async with create_session() as session:
+                kwargs = dict(session=session, limiter=limiter, shard=SHARD, query=QUERY, low_price=1,
+                              top_price=TOP_PRICE, log_output=[], on_page=on_page)
+                if range_crawl:
+                    await scrap_price_range(price_ranges=price_ranges, **kwargs)
+                else:
+                    await scrap_pages(**kwargs)
+            return server, ids, stream, price_ranges
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def restore_catalog_api(monkeypatch):
+    monkeypatch.setattr(wb_parser, 'CATALOG_API', wb_parser.CATALOG_API)
+
+
+def test_is_capped():
+    assert is_capped(MAX_PAGES * PAGE_SIZE + 1, [])
+    assert not is_capped(MAX_PAGES * PAGE_SIZE, [PAGE_SIZE] * MAX_PAGES)
+    # без total - только по числу полных страниц
+    assert is_capped(None, [PAGE_SIZE] * MAX_PAGES)
+    assert not is_capped(None, [PAGE_SIZE] * (MAX_PAGES - 1) + [PAGE_SIZE - 1])
+    assert not is_capped(0, [])
+
+
+def test_pages_up_to_total():
+    server, ids, _, _ = crawl(250, with_total=True)
+    assert set(ids) == catalog_ids(server) and len(ids) == 250
+    # total известен по первой странице - запрашиваются только существующие страницы
+    assert server.requests == 3
+
+
+@pytest.mark.parametrize('products, pages', [(250, 3), (300, 4), (0, 1)])
+def test_pages_stop_at_partial_or_empty_page(products, pages):
+    # по одному запросу за раз: страницы после неполной или пустой отменяются, не успев уйти на сервер
+    server, ids, _, _ = crawl(products, with_total=False, concurrency=1)
+    assert set(ids) == catalog_ids(server) and len(ids) == products
+    assert pages <= server.requests <= pages + 1
+
+
+def test_pages_past_the_end_are_cancelled():
+    server, ids, _, _ = crawl(250, with_total=False, concurrency=3)
+    assert len(ids) == 250
+    # 50 страниц запланировано, но за концом выдачи уходят только запросы, успевшие занять слот
+    assert server.requests <= 3 + 2 * 3
+
+
+@pytest.mark.parametrize('with_total', [True, False])
+def test_price_range_split(with_total):
+    server, ids, stream, price_ranges = crawl(12000, with_total=with_total, range_crawl=True)
+    assert set(ids) == catalog_ids(server)
+    # товары поделенного диапазона и товары с ценой ровно на общей границе частей приходят повторно
+    # и убираются по id
+    assert len(ids) > len(server.products) and stream.count == len(server.products)
+    middles = {top for low, top in price_ranges} & {low for low, top in price_ranges}
+    assert any(product['priceU'] // 100 in middles for product in server.products)
+
+    sizes = {(low, top): len(catalog_ids(server, low, top)) for low, top in price_ranges}
+    split = [size for size in sizes.values() if size > MAX_PAGES * PAGE_SIZE]
+    leaves = [size for size in sizes.values() if size <= MAX_PAGES * PAGE_SIZE]
+    assert split and len(price_ranges) == 2 * len(split) + 1
+    if with_total:
+        # поделенный диапазон - одна первая страница, остальные - ровно их страницы
+        assert server.requests == len(split) + sum(max(1, math.ceil(size / PAGE_SIZE)) for size in leaves)
+    else:
+        # без total поделенный диапазон узнается по 50 полным страницам
+        expected = len(split) * MAX_PAGES + sum(size // PAGE_SIZE + 1 for size in leaves)
+        assert expected <= server.requests <= expected + 10 * len(leaves)
@@ -0,0 +1,106 @@
+import datetime
+
+import pytest
+
+from periodic import MAX_JITTER, CronSchedule, IntervalSchedule, PeriodicScheduler, parse_cron_field, parse_schedule
+
+SUNDAY = datetime.datetime(2026, 10, 18, 12, 30)
+
+
+def test_parse_cron_field():
+    assert parse_cron_field('*/15', 0, 59) == {0, 15, 30, 45}
+    assert parse_cron_field('1-5', 0, 7) == {1, 2, 3, 4, 5}
+    assert parse_cron_field('1,3,10-12', 1, 31) == {1, 3, 10, 11, 12}
+    assert parse_cron_field('5/20', 0, 59) == {5, 25, 45}
+    for text in ('60', '5-1', '*/0', 'x'):
+        with pytest.raises(ValueError):
+            parse_cron_field(text, 0, 59)
+
+
+def test_parse_schedule():
+    assert parse_schedule('') is None
+    assert parse_schedule('  ') is None
+    assert parse_schedule('30m').seconds == 30 * 60
+    assert parse_schedule('2H').seconds == 2 * 60 * 60
+    assert isinstance(parse_schedule('0 9 * * *'), CronSchedule)
+    for text in ('0m', '1 2 3', '0 24 * * *', '0 0 31 2 *'):
+        with pytest.raises(ValueError):
+            parse_schedule(text)
+
+
+def test_interval_next_run():
+    assert IntervalSchedule(3600).next_run(SUNDAY) == SUNDAY + datetime.timedelta(hours=1)
+
+
+def test_cron_next_run():
+    assert parse_schedule('0 9 * * *').next_run(SUNDAY) == datetime.datetime(2026, 10, 19, 9, 0)
+    assert parse_schedule('*/15 * * * *').next_run(SUNDAY) == datetime.datetime(2026, 10, 18, 12, 45)
+    # понедельник - 1, воскресенье - 0 и 7
+    assert parse_schedule('0 9 * * 1').next_run(SUNDAY) == datetime.datetime(2026, 10, 19, 9, 0)
+    assert parse_schedule('0 13 * * 7').next_run(SUNDAY) == datetime.datetime(2026, 10, 18, 13, 0)
+    # следующая минута, даже если текущая подходит
+    assert parse_schedule('30 12 * * *').next_run(SUNDAY) == datetime.datetime(2026, 10, 19, 12, 30)
+    assert parse_schedule('0 0 29 2 *').next_run(SUNDAY) == datetime.datetime(2028, 2, 29, 0, 0)
+
+
+def test_cron_day_of_month_or_weekday():
+    # как в cron: заданы и день месяца, и день недели - достаточно одного
+    schedule = parse_schedule('0 0 13 * 5')
+    assert schedule.next_run(SUNDAY) == datetime.datetime(2026, 10, 23, 0, 0)
+    assert schedule.next_run(datetime.datetime(2026, 11, 7)) == datetime.datetime(2026, 11, 13, 0, 0)
+
+
+def test_cron_never_fires():
+    fields = [parse_cron_field(field, low, high)
+              for field, (low, high) in zip('0 0 31 2 *'.split(), [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)])]
+    with pytest.raises(ValueError):
+        CronSchedule(fields).next_run(SUNDAY)
+
+
+def test_due_runs_overdue_task_once():
+    scheduler = PeriodicScheduler()
+    task = {'id': 1, 'schedule': '1h', 'last_update': '18.10.2026 10:00'}
+    later = SUNDAY + datetime.timedelta(seconds=MAX_JITTER)
+    scheduler.due([task], lambda task_id: False, now=SUNDAY)
+    assert scheduler.due([task], lambda task_id: False, now=later) == [task]
+    assert scheduler.due([task], lambda task_id: False, now=later) == []
+
+
+def test_due_spreads_overdue_tasks():
+    scheduler = PeriodicScheduler()
+    tasks = [{'id': i, 'schedule': '1h', 'last_update': '17.10.2026 12:00'} for i in range(40)]
+    first = scheduler.due(tasks, lambda task_id: False, now=SUNDAY)
+    assert first == []
+    started = set()
+    for second in range(10, MAX_JITTER + 1, 10):
+        for task in scheduler.due(tasks, lambda task_id: False, now=SUNDAY + datetime.timedelta(seconds=second)):
+            assert task['id'] not in started
+            started.add(task['id'])
+    assert len(started) == 40
+
+
+def test_due_skips_running_and_manual_tasks():
+    scheduler = PeriodicScheduler()
+    tasks = [
+        {'id': 1, 'schedule': '1h', 'last_update': '18.10.2026 10:00'},
+        {'id': 2, 'schedule': '', 'last_update': '18.10.2026 10:00'},
+    ]
+    assert scheduler.due(tasks, lambda task_id: task_id == 1, now=SUNDAY) == []
+
+
+def test_due_survives_schedule_that_stops_firing(monkeypatch):
+    scheduler = PeriodicScheduler()
+    bad = {'id': 1, 'schedule': '0 0 29 2 *'}
+    good = {'id': 2, 'schedule': '1m', 'last_update': '18.10.2026 10:00'}
+    real_plan = scheduler.plan
+
+    def plan(schedule, after):
+        if isinstance(schedule, CronSchedule):
+            raise ValueError('Расписание никогда не срабатывает')
+        return real_plan(schedule, after)
+
+    monkeypatch.setattr(scheduler, 'plan', plan)
+    assert scheduler.due([bad, good], lambda task_id: False, now=SUNDAY) == []
+    later = SUNDAY + datetime.timedelta(minutes=1)
+    assert scheduler.due([bad, good], lambda task_id: False, now=later) == [good]
+    assert 1 not in scheduler.planned
@@ -0,0 +1,89 @@
+import math
+import pickle
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from products import FIELDS, ProductColumns, discount_depth, page_products
+
+
+def sample_rows() -> list:
+    return [
+        (1, 'Кронштейн; "угловой"\nчерный', 1000, 800, 20, 'Бренд', 4.5, 'Продавец', 4.8, 12, 4.6, 'Промо', None),
+        (2, None, 500, 500, 0, '', None, 'Продавец', None, None, None, None, ''),
+        (3, 'Товар', None, None, None, 'Бренд', 5.0, None, 4.1, 0, 5.0, '', 'Акция'),
+    ]
+
+
+def filled(extra_fields: tuple = (), rows: list = None) -> ProductColumns:
+    products = ProductColumns(extra_fields)
+    for row in rows if rows is not None else sample_rows():
+        products.write(row + ('добавлен',) * len(extra_fields))
+    return products
+
+
+def assert_same_rows(left: ProductColumns, right: ProductColumns):
+    assert left.fields == right.fields
+    for a, b in zip(left.rows(), right.rows(), strict=True):
+        for x, y in zip(a, b, strict=True):
+            assert x == y or (isinstance(x, float) and math.isnan(x) and math.isnan(y))
+
+
+def test_pack_round_trip():
+    products = filled()
+    restored = ProductColumns.unpack(pickle.loads(pickle.dumps(products.pack())))
+    assert_same_rows(products, restored)
+    assert_frame_equal(products.to_dataframe(), restored.to_dataframe())
+
+
+def test_pack_keeps_none_and_empty_strings():
+    restored = ProductColumns.unpack(filled().pack())
+    names = restored.column(FIELDS.index('Наименование'))
+    promo = restored.column(FIELDS.index('Промо текст категории'))
+    assert names[1] is None
+    assert promo == [None, '', 'Акция']
+
+
+def test_pack_extra_fields_and_empty():
+    products = filled(extra_fields=('Изменение',))
+    restored = ProductColumns.unpack(products.pack())
+    assert restored.fields == FIELDS + ['Изменение']
+    assert_same_rows(products, restored)
+    empty = ProductColumns.unpack(ProductColumns().pack())
+    assert len(empty) == 0 and len(empty.to_dataframe()) == 0
+
+
+def test_pack_stores_repeated_strings_once():
+    rows = sample_rows() * 1000
+    packed = filled(rows=rows).pack()
+    brand_values, brand_indices = packed[2][FIELDS.index('Бренд')]
+    assert brand_values == ['Бренд', '']
+    assert len(brand_indices) == len(rows) * 4
+    restored = ProductColumns.unpack(pickle.loads(pickle.dumps(packed)))
+    brands = restored.column(FIELDS.index('Бренд'))
+    assert brands[0] is brands[3]
+
+
+def test_pack_keeps_nul_inside_strings():
+    row = (1, 'a\0b', 1000, 800, 20, '\0', None, '', None, None, None, None, None)
+    products = filled(rows=[row])
+    restored = ProductColumns.unpack(pickle.loads(pickle.dumps(products.pack())))
+    assert_same_rows(products, restored)
+    assert restored.column(FIELDS.index('Наименование')) == ['a\0b']
+
+
+def test_discount_depth_column():
+    df = filled().to_dataframe()
+    assert df['Глубина скидки, %'].tolist()[:2] == [20.0, 0.0]
+    assert df['Глубина скидки, %'].isna().tolist() == [False, False, True]
+    assert discount_depth(1000, 800) == 20.0
+    assert discount_depth(None, None) is None and discount_depth(0, 0) is None
+    assert list(df.columns[-2:]) == ['Глубина скидки, %', 'Ссылка']
+    assert isinstance(df, pd.DataFrame)
+
+
+def test_page_products():
+    assert page_products({}) is None
+    assert page_products({'data': None}) == []
+    assert page_products({'data': {'products': None}}) == []
+    assert page_products({'data': {'products': [{'id': 1}]}}) == [{'id': 1}]
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from products import FIELDS, ProductColumns
+from regions import DEFAULT_DEST, merge_regions, parse_dests, region_column, region_key
+
+
+def table(*rows) -> ProductColumns:
+    products = ProductColumns()
+    for product_id, sale_price in rows:
+        row = [None] * len(FIELDS)
+        row[:5] = [product_id, f'Товар {product_id}', 1000, sale_price, 10]
+        products.write(tuple(row))
+    return products
+
+
+def test_parse_dests_and_keys():
+    assert parse_dests('') == [DEFAULT_DEST]
+    assert parse_dests('1, 2;1') == [1, 2]
+    assert region_key('task', DEFAULT_DEST) == 'task'
+    assert region_key('task', 2) == 'task&dest=2'
+
+
+def test_merge_regions():
+    merged = merge_regions({1: table((10, 900), (11, 800)), 2: table((11, 700), (12, 600))})
+    assert merged['id'].tolist() == [10, 11, 12]
+    assert merged[region_column(1)].tolist() == [900, 800, pd.NA]
+    assert merged[region_column(2)].tolist() == [pd.NA, 700, 600]
+    assert list(merged.columns[-2:]) == ['Глубина скидки, %', 'Ссылка']
+
+
+def test_merge_region_without_products():
+    merged = merge_regions({1: table((10, 900)), 2: ProductColumns()})
+    assert merged['id'].tolist() == [10]
+    assert merged[region_column(1)].tolist() == [900]
+    assert merged[region_column(2)].isna().all()
+    assert str(merged[region_column(2)].dtype) == 'Int64'
+    empty = merge_regions({1: ProductColumns(), 2: ProductColumns()})
+    assert len(empty) == 0 and region_column(2) in empty.columns
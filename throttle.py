@@ -0,0 +1,110 @@
+import asyncio
+import contextlib
+import datetime
+import email.utils
+import random
+import time
+
+REQUEST_RATE = 20  # запросов в секунду в среднем
+REQUEST_BURST = 20  # сколько запросов можно отправить разом после простоя
+CONCURRENCY = 10  # стартовое число одновременных запросов
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 30
+BACKOFF_BASE = 0.5  # базовая задержка перед повтором, сек.
+BACKOFF_CAP = 30  # максимальная задержка перед повтором, сек.
+THROTTLE_WINDOW = 1.0  # повторные 429 в течение этого окна не уменьшают параллельность еще раз, сек.
+
+
+def parse_retry_after(value: str):
+    """значение заголовка Retry-After в секундах (число секунд или HTTP дата)"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
+
+
+class RateLimiter:
+    """ограничение частоты (token bucket) и параллельности (AIMD) запросов к WB"""
+
+    def __init__(self, rate: float = REQUEST_RATE, burst: int = REQUEST_BURST, concurrency: int = CONCURRENCY,
+                 min_concurrency: int = MIN_CONCURRENCY, max_concurrency: int = MAX_CONCURRENCY):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.concurrency = float(concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.paused_until = 0.0
+        self.last_throttle = 0.0
+        self._condition = None
+        self._token_lock = None
+        # статистика
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+
+    @property
+    def limit(self) -> int:
+        return max(int(self.concurrency), self.min_concurrency)
+
+    async def _take_token(self):
+        async with self._token_lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """место для одного запроса: ждем свободный слот параллельности и токен"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+            self._token_lock = asyncio.Lock()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        try:
+            await self._take_token()
+            self.requests += 1
+            yield
+        finally:
+            async with self._condition:
+                self.active -= 1
+                self._condition.notify_all()
+
+    def on_success(self):
+        """аддитивное увеличение: +1 к параллельности примерно за каждое окно успешных ответов"""
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+
+    def on_throttle(self, retry_after: float = None):
+        """мультипликативное уменьшение параллельности и пауза по Retry-After"""
+        now = time.monotonic()
+        self.throttled += 1
+        if now - self.last_throttle > THROTTLE_WINDOW:
+            self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+            self.last_throttle = now
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """задержка перед повтором: экспоненциальная с джиттером или по Retry-After"""
+        self.retries += 1
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))